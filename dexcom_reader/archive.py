@@ -0,0 +1,251 @@
+"""A single-file archive of a receiver's raw database pages.
+
+    archive.Capture(dex, "receiver.dxa")
+    with archive.Archive("receiver.dxa") as arc:
+        arc.ReadRecords("EGV_DATA")
+        arc.ReadRecordsBetween("EGV_DATA", start, end)
+
+Layout, all little-endian:
+
+    pages     each page's header and payload exactly as received
+    index     one ENTRY per page: record type index, page number, offset and
+              length of the page, system time of its first and last record
+    metadata  JSON: serial number, firmware header, device class, ...
+    trailer   TRAILER: index offset and count, metadata offset and length,
+              MAGIC
+
+Archive memory-maps the file; a page is a memoryview into the map, found
+through the index in O(1), and goes through the usual Dexcom.ParsePage.
+"""
+
+import bisect
+import datetime
+import json
+import mmap
+import os
+import struct
+
+from . import constants, database_records, readdata
+
+MAGIC = b"DXA1"
+ENTRY = struct.Struct("<BIQIII")
+TRAILER = struct.Struct("<QIQI4s")
+
+
+def _ReceiverSeconds(when):
+    return int((when - constants.BASE_TIME).total_seconds())
+
+
+class ArchiveWriter:
+    """Write an archive to path + ".tmp", renamed to path on close().
+
+    Used as a context manager, an exception leaves path untouched and the
+    partial file is deleted instead, so a failed capture never passes for
+    a complete archive.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self._tmp = path + ".tmp"
+        self._file = open(self._tmp, "wb")
+        self._entries = []
+
+    def AddPage(self, header, data, first_time=0, last_time=0):
+        """Append one page; times are receiver system seconds."""
+        offset = self._file.tell()
+        raw = bytes(data)
+        self._file.write(database_records.PAGE_HEADER.pack(*header))
+        self._file.write(raw)
+        length = self._file.tell() - offset
+        self._entries.append(
+            ENTRY.pack(header[2], header[4], offset, length, first_time, last_time)
+        )
+
+    def close(self):
+        index_offset = self._file.tell()
+        self._file.write(b"".join(self._entries))
+        meta_offset = self._file.tell()
+        meta = json.dumps(self.metadata, sort_keys=True).encode()
+        self._file.write(meta)
+        self._file.write(
+            TRAILER.pack(
+                index_offset, len(self._entries), meta_offset, len(meta), MAGIC
+            )
+        )
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """Discard everything written so far."""
+        self._file.close()
+        os.unlink(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def Capture(dex, path, record_types=None):
+    """Download every page of record_types from dex into an archive at path.
+
+    record_types defaults to every type dex can parse. Returns the number of
+    pages written per record type.
+    """
+    if record_types is None:
+        record_types = ["MANUFACTURING_DATA"] + sorted(dex.PARSER_MAP)
+    metadata = dict(
+        device_class=type(dex).__name__,
+        serial_number=dex.ReadSerialNumber(),
+        firmware=dict(dex.GetFirmwareHeader().attrib),
+        captured=datetime.datetime.now().isoformat(),
+    )
+    counts = {}
+    with ArchiveWriter(path, metadata) as writer:
+        for record_type in record_types:
+            counts[record_type] = 0
+            pages = dex.PageNumbers(record_type)
+            for header, data in dex._iter_pages(record_type, pages):
+                records = list(dex.ParsePage(header, data))
+                first = records[0].data[0] if records else 0
+                last = records[-1].data[0] if records else 0
+                writer.AddPage(header, data, first, last)
+                counts[record_type] += 1
+    return counts
+
+
+class Archive:
+    """Read-only, memory-mapped view of an archive written by ArchiveWriter.
+
+    device_class picks the record parsers and defaults to the one recorded
+    at capture. Pages are memoryviews into the map, so close() leaves the
+    map open while any of them (or records not yet copied out) are alive.
+    """
+
+    def __init__(self, path, device_class=None):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if len(self._view) < TRAILER.size:
+            raise constants.Error("%s is not a receiver archive" % path)
+        index_offset, count, meta_offset, meta_length, magic = TRAILER.unpack_from(
+            self._view, len(self._view) - TRAILER.size
+        )
+        if magic != MAGIC:
+            raise constants.Error("%s is not a receiver archive" % path)
+        self.metadata = json.loads(
+            bytes(self._view[meta_offset : meta_offset + meta_length])
+        )
+        # (record type index, page) -> (offset, length, first time, last time)
+        self._index = {}
+        # record type index -> sorted pages, and their first and last times
+        self._pages = {}
+        self._first_times = {}
+        self._last_times = {}
+        for entry in ENTRY.iter_unpack(
+            self._view[index_offset : index_offset + count * ENTRY.size]
+        ):
+            type_index, page = entry[:2]
+            self._index[type_index, page] = entry[2:]
+            self._pages.setdefault(type_index, []).append(page)
+        for type_index, pages in self._pages.items():
+            pages.sort()
+            entries = [self._index[type_index, page] for page in pages]
+            self._first_times[type_index] = [entry[2] for entry in entries]
+            self._last_times[type_index] = [entry[3] for entry in entries]
+        if device_class is None:
+            device_class = getattr(
+                readdata, self.metadata.get("device_class", "Dexcom"), readdata.Dexcom
+            )
+        # Used only for its record parsers, never opened.
+        self.parser = device_class(None)
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def RecordTypes(self):
+        return [constants.RECORD_TYPES[i] for i in sorted(self._pages)]
+
+    def PageNumbers(self, record_type):
+        return list(self._pages.get(constants.RECORD_TYPES.index(record_type), []))
+
+    def ReadPage(self, record_type, page):
+        """The (header, data) pair of page, data a memoryview into the map."""
+        type_index = constants.RECORD_TYPES.index(record_type)
+        try:
+            offset, length, _, _ = self._index[type_index, page]
+        except KeyError:
+            raise constants.Error("Page %d of %s not archived" % (page, record_type))
+        header = self.parser.ParsePageHeader(self._view, type_index, page, offset)
+        header_size = database_records.PAGE_HEADER.size
+        return header, self._view[offset + header_size : offset + length]
+
+    def iter_raw_pages(self, record_type, pages=None, reverse=False):
+        if pages is None:
+            pages = self.PageNumbers(record_type)
+        for page in reversed(pages) if reverse else pages:
+            yield self.ReadPage(record_type, page)
+
+    def iter_records(self, record_type, reverse=True, since=None, limit=None):
+        """Yield records, newest first unless not reverse.
+
+        since and limit are as for Dexcom.iter_records; oldest first, the
+        pages from since on come from PagesBetween.
+        """
+        pages = None
+        if since is not None and not reverse:
+            pages = self.PagesBetween(record_type, since)
+        records = (
+            record
+            for header, data in self.iter_raw_pages(record_type, pages, reverse)
+            for record in self.parser.ParsePage(header, data, reverse=reverse)
+        )
+        yield from readdata.TakeRecords(records, since, limit, reverse)
+
+    def ReadRecords(self, record_type):
+        return list(self.iter_records(record_type, reverse=False))
+
+    def PagesBetween(self, record_type, start=None, end=None):
+        """Archived pages holding records with start <= system_time <= end.
+
+        Found by bisecting the index's per-page first and last times.
+        """
+        type_index = constants.RECORD_TYPES.index(record_type)
+        if type_index not in self._pages:
+            return []
+        lo, hi = 0, len(self._pages[type_index])
+        if start is not None:
+            lo = bisect.bisect_left(
+                self._last_times[type_index], _ReceiverSeconds(start)
+            )
+        if end is not None:
+            hi = bisect.bisect_right(
+                self._first_times[type_index], _ReceiverSeconds(end)
+            )
+        return self._pages[type_index][lo:hi]
+
+    def iter_records_between(self, record_type, start=None, end=None):
+        pages = self.PagesBetween(record_type, start, end)
+        for header, data in self.iter_raw_pages(record_type, pages):
+            for record in self.parser.ParsePage(header, data):
+                when = record.system_time
+                if (start is None or when >= start) and (end is None or when <= end):
+                    yield record
+
+    def ReadRecordsBetween(self, record_type, start=None, end=None):
+        return list(self.iter_records_between(record_type, start, end))
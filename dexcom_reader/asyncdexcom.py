@@ -0,0 +1,263 @@
+import asyncio
+import os
+import struct
+
+import serial
+
+from . import constants, framereader, packetwriter, readdata, recordbatch, util
+
+
+class _WriteProtocol(asyncio.Protocol):
+    pass
+
+
+class AsyncDexcom:
+    """asyncio client for a receiver, mirroring the Dexcom command surface.
+
+    The tty is opened and configured through serial.Serial as usual, then its
+    file descriptor is driven by the event loop, so one loop can talk to many
+    receivers. Framing, CRC checks and record parsing are shared with the
+    synchronous Dexcom class; device_class selects the record parsers (G4,
+    DexcomG5 or DexcomG6).
+    """
+
+    def __init__(
+        self,
+        port,
+        device_class=readdata.Dexcom,
+        crc_mode=constants.CRC_STRICT,
+        timeout=None,
+    ):
+        self._port_name = port
+        self._serial = None
+        self._reader = None
+        self._read_transport = None
+        self._transport = None
+        self._hunt_sof = False
+        self._stale = False
+        self._lock = None
+        self.timeout = timeout
+        # Used only for its page splitting and record parsers, never opened.
+        self.parser = device_class(port, crc_mode=crc_mode)
+
+    def _Lock(self):
+        # Made on first use, inside the running loop: before Python 3.10 an
+        # asyncio.Lock is bound to the loop current when it is created.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def Connect(self):
+        async with self._Lock():
+            await self._Open()
+
+    async def _Open(self):
+        # Callers hold the lock, so concurrent first commands open once.
+        if self._reader is not None:
+            return
+        self._serial = serial.Serial(port=self._port_name, baudrate=115200)
+        fd = self._serial.fileno()
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        self._read_transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(os.dup(fd), "rb", buffering=0),
+        )
+        self._transport, _ = await loop.connect_write_pipe(
+            _WriteProtocol, os.fdopen(os.dup(fd), "wb", buffering=0)
+        )
+        self._reader = reader
+        self._hunt_sof = self._stale = False
+
+    async def Disconnect(self):
+        async with self._Lock():
+            for transport in (self._read_transport, self._transport):
+                if transport is not None:
+                    transport.close()
+            if self._serial is not None:
+                self._serial.close()
+            self._reader = self._read_transport = None
+            self._transport = self._serial = None
+
+    async def __aenter__(self):
+        await self.Connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.Disconnect()
+
+    # Seconds the line must stay quiet before a resync considers it drained.
+    RESYNC_QUIET = 0.1
+    # Frames a resync skips while waiting for its PING to be answered.
+    RESYNC_FRAMES = 16
+
+    async def _Drain(self, quiet):
+        """Discard input until none has arrived for quiet seconds."""
+        self._serial.reset_input_buffer()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(self._reader.read(4096), quiet)
+            except asyncio.TimeoutError:
+                return
+            if not chunk:
+                return
+
+    async def _Resync(self):
+        """Make sure no reply to a failed command is still on its way.
+
+        A reply to a timed-out command can arrive after the input was
+        drained, and would be taken for the next command's reply, so a PING
+        is sent and frames are skipped until its bare ACK comes back. Called
+        with the lock held; on failure the next command tries again.
+        """
+        p = packetwriter.PacketWriter()
+        p.ComposePacket(constants.PING)
+        self._transport.write(p.PacketString())
+        for _ in range(self.RESYNC_FRAMES):
+            packet = await asyncio.wait_for(self.readpacket(), self.timeout)
+            if packet.command == constants.ACK and not packet.data:
+                break
+        else:
+            raise constants.Error("Could not resynchronise with the receiver")
+        # A late reply that was itself a bare ACK leaves the PING's behind.
+        await self._Drain(self.RESYNC_QUIET)
+        self._stale = False
+
+    async def _SkipToSOF(self):
+        for _ in range(packetwriter.PacketWriter.MAX_LEN):
+            first = await self._reader.readexactly(1)
+            if first == readdata.SOF:
+                return first
+        raise constants.Error("Error reading packet header!")
+
+    async def readpacket(self):
+        if self._hunt_sof:
+            self._hunt_sof = False
+            first = await self._SkipToSOF()
+            header = first + await self._reader.readexactly(framereader.HEADER_LEN - 1)
+        else:
+            header = await self._reader.readexactly(framereader.HEADER_LEN)
+        length = framereader.frame_length(header)
+        rest = await self._reader.readexactly(length - framereader.HEADER_LEN)
+        return readdata.ReadPacket(*framereader.decode_frame(header + rest))
+
+    async def Command(self, command_id, *args, **kwargs):
+        """Send one command and return the receiver's reply.
+
+        After a timeout or a framing or CRC error the input is drained, and
+        the link is checked with _Resync before the next command is sent.
+        """
+        p = packetwriter.PacketWriter()
+        p.ComposePacket(command_id, *args, **kwargs)
+        async with self._Lock():
+            await self._Open()
+            if self._stale:
+                await self._Resync()
+            self._transport.write(p.PacketString())
+            try:
+                return await asyncio.wait_for(self.readpacket(), self.timeout)
+            except (asyncio.TimeoutError, constants.Error):
+                # As Dexcom.resync: drop what is left of the exchange and
+                # make the next read skip ahead to a start-of-frame byte.
+                await self._Drain(self.RESYNC_QUIET)
+                self._hunt_sof = self._stale = True
+                raise
+
+    async def GenericReadCommand(self, command_id):
+        return await self.Command(command_id)
+
+    async def Ping(self):
+        packet = await self.Command(constants.PING)
+        return packet.command == constants.ACK
+
+    async def ReadRTC(self):
+        rtc = (await self.GenericReadCommand(constants.READ_RTC)).data
+        return util.ReceiverTimeToTime(struct.unpack("I", rtc)[0])
+
+    async def ReadSystemTime(self):
+        rtc = (await self.GenericReadCommand(constants.READ_SYSTEM_TIME)).data
+        return util.ReceiverTimeToTime(struct.unpack("I", rtc)[0])
+
+    async def ReadBatteryLevel(self):
+        level = (await self.GenericReadCommand(constants.READ_BATTERY_LEVEL)).data
+        return struct.unpack("I", level)[0]
+
+    async def ReadTransmitterId(self):
+        return (await self.GenericReadCommand(constants.READ_TRANSMITTER_ID)).data
+
+    async def ReadDatabasePageRange(self, record_type):
+        record_type_index = constants.RECORD_TYPES.index(record_type)
+        packet = await self.Command(
+            constants.READ_DATABASE_PAGE_RANGE, record_type_index
+        )
+        return struct.unpack("II", packet.data)
+
+    async def ReadDatabasePages(self, record_type, page, count=1):
+        record_type_index = constants.RECORD_TYPES.index(record_type)
+        packet = await self.Command(
+            constants.READ_DATABASE_PAGES,
+            (record_type_index, struct.pack("<I", page), count),
+        )
+        if packet.command != constants.ACK:
+            raise constants.Error(
+                "READ_DATABASE_PAGES answered with %d" % packet.command
+            )
+        return self.parser.SplitPages(packet.data, record_type_index, page, count)
+
+    async def ReadDatabasePageHeader(self, record_type, page):
+        record_type_index = constants.RECORD_TYPES.index(record_type)
+        packet = await self.Command(
+            constants.READ_DATABASE_PAGE_HEADER,
+            (record_type_index, struct.pack("<I", page)),
+        )
+        if packet.command != constants.ACK:
+            raise constants.Error(
+                "READ_DATABASE_PAGE_HEADER answered with %d" % packet.command
+            )
+        return self.parser.ParsePageHeader(packet.data, record_type_index, page)
+
+    async def ReadDatabasePage(self, record_type, page):
+        header, data = (await self.ReadDatabasePages(record_type, page))[0]
+        return self.parser.ParsePage(header, data)
+
+    async def PageNumbers(self, record_type):
+        assert record_type in constants.RECORD_TYPES
+        page_range = await self.ReadDatabasePageRange(record_type)
+        return self.parser.PagesInRange(page_range)
+
+    async def iter_raw_pages(self, record_type, pages, reverse=False):
+        for first, count in self.parser.PageBatches(pages, reverse):
+            batch = await self.ReadDatabasePages(record_type, first, count)
+            for item in reversed(batch) if reverse else batch:
+                yield item
+
+    async def iter_records(self, record_type, since=None, limit=None):
+        """Yield records newest first; see Dexcom.iter_records."""
+        if limit is not None and limit <= 0:
+            return
+        pages = await self.PageNumbers(record_type)
+        count = 0
+        stop, step = pages.stop, 1
+        while stop > pages.start:
+            # The newest page alone first, as Dexcom._iter_newest_pages.
+            first = max(pages.start, stop - step)
+            chunk = range(first, stop)
+            stop, step = first, self.parser.PAGES_PER_REQUEST
+            async for header, data in self.iter_raw_pages(record_type, chunk, True):
+                for record in self.parser.ParsePage(header, data, reverse=True):
+                    if since is not None and record.system_time < since:
+                        return
+                    yield record
+                    count += 1
+                    if count == limit:
+                        return
+
+    async def ReadRecords(self, record_type, batch=False):
+        pages = await self.PageNumbers(record_type)
+        if batch:
+            raw = [page async for page in self.iter_raw_pages(record_type, pages)]
+            return recordbatch.FromPages(self.parser, record_type, raw)
+        records = []
+        async for header, data in self.iter_raw_pages(record_type, pages):
+            records.extend(self.parser.ParsePage(header, data))
+        return records
@@ -0,0 +1,339 @@
+"""Micro-benchmarks for the hot paths of a receiver download.
+
+Run with:  python -m dexcom_reader.benchmarks [name ...]
+"""
+
+import io
+import json
+import os
+import struct
+import sys
+import time
+import timeit
+import tracemalloc
+
+from . import (
+    columnar,
+    constants,
+    crc16,
+    database_records,
+    emulator,
+    instrumentation,
+    parallel,
+    readdata,
+    recordbatch,
+    util,
+)
+
+
+class _LoopbackPort:
+    """Serial port stand-in that answers every write with a canned response."""
+
+    def __init__(self, response):
+        self._response = response
+        self._buf = io.BytesIO()
+        self.reads = 0
+
+    @property
+    def in_waiting(self):
+        return len(self._response) - self._buf.tell()
+
+    def write(self, data):
+        self._buf = io.BytesIO(self._response)
+        return len(data)
+
+    def read(self, size=1):
+        self.reads += 1
+        return self._buf.read(size)
+
+    def readinto(self, b):
+        self.reads += 1
+        return self._buf.readinto(b)
+
+    def flush(self):
+        pass
+
+
+def _legacy_records(cls, header, data):
+    """Records built as before the schema registry: a new Struct per call."""
+    padded = cls._ClassSize() != database_records.Schema(cls).size
+    for x in range(header[1]):
+        size = cls._ClassSize() if padded else struct.Struct(cls.FORMAT).size
+        offset = x * size
+        raw_data = bytes(data[offset : offset + size])
+        yield cls(struct.Struct(cls.FORMAT).unpack_from(raw_data), raw_data)
+
+
+def _measure(fn):
+    """Peak bytes, and bytes and blocks still held by fn()'s result."""
+    fn()
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("filename")
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, retained, sum(stat.count for stat in stats)
+
+
+def bench_crc16(size=1590, number=2000):
+    buf = os.urandom(size)
+    for name, fn in sorted(crc16.BACKENDS.items()):
+        elapsed = min(timeit.repeat(lambda: fn(buf), number=number, repeat=3))
+        mbps = size * number / elapsed / 1e6
+        print("crc16 %-10s %8.2f MB/s" % (name, mbps))
+
+
+def bench_page_allocations():
+    """Allocations and time to receive and parse one EGV page.
+
+    "copies" builds each record from its own slice of the page, as Create
+    does and as GenericRecordYielder did before a page's records shared one
+    buffer; "shared" is ReadDatabasePage.
+    """
+    response = emulator.Frame(
+        constants.ACK, emulator.SyntheticDatabase().page("EGV_DATA", 1)
+    )
+    dex = readdata.Dexcom(None)
+    dex._port = _LoopbackPort(response)
+
+    def copies():
+        header, data = dex.ReadDatabasePages("EGV_DATA", 1)[0]
+        record_class = dex.RecordClass(header)
+        return [record_class.Create(data, x) for x in range(header[1])]
+
+    def shared():
+        return list(dex.ReadDatabasePage("EGV_DATA", 1))
+
+    for name, read in (("copies", copies), ("shared", shared)):
+        peak, retained, blocks = _measure(read)
+        elapsed = min(timeit.repeat(read, number=500, repeat=5)) / 500
+        print(
+            "page %-6s peak %6d bytes, %6d bytes in %4d blocks retained, %6.1f us"
+            % (name, peak, retained, blocks, elapsed * 1e6)
+        )
+
+
+def bench_readpacket(number=20000):
+    response = emulator.Frame(constants.ACK, struct.pack("<I", 83))
+    for buffered in (False, True):
+        dex = readdata.Dexcom(None, buffered=buffered)
+        port = dex._port = _LoopbackPort(response)
+
+        def ping():
+            port.write(b"")
+            return dex.readpacket()
+
+        elapsed = min(timeit.repeat(ping, number=number, repeat=3))
+        port.reads = 0
+        ping()
+        print(
+            "readpacket buffered=%-5s %7.2f us/packet, %d reads/packet"
+            % (buffered, elapsed / number * 1e6, port.reads)
+        )
+
+
+def bench_download(pages=50, baud=115200):
+    db = emulator.SyntheticDatabase(pages={"EGV_DATA": pages})
+    for label, byte_delay in (("no delay", 0.0), ("%d baud" % baud, 10.0 / baud)):
+        for options in ({}, {"pipelined": True}):
+            with emulator.ReceiverEmulator(db, byte_delay=byte_delay) as rx:
+                dex = readdata.Dexcom(rx.port, **options)
+                started = time.time()
+                records = dex.ReadRecords("EGV_DATA")
+                elapsed = time.time() - started
+                dex.Disconnect()
+            print(
+                "download %-12s %-9s %7.1f pages/s %8.1f records/s"
+                % (
+                    label,
+                    "pipelined" if options else "serial",
+                    pages / elapsed,
+                    len(records) / elapsed,
+                )
+            )
+
+
+def bench_metrics(number=20000):
+    response = emulator.Frame(constants.ACK, struct.pack("<I", 83))
+    for metrics in (None, instrumentation.Metrics()):
+        dex = readdata.Dexcom(None, metrics=metrics)
+        dex._port = _LoopbackPort(response)
+        elapsed = min(
+            timeit.repeat(
+                lambda: dex.GenericReadCommand(constants.READ_BATTERY_LEVEL),
+                number=number,
+                repeat=3,
+            )
+        )
+        print(
+            "command metrics=%-5s %7.2f us/command"
+            % (metrics is not None, elapsed / number * 1e6)
+        )
+
+
+def bench_columnar(pages=200, number=5):
+    """Decode EGV pages as record objects versus NumPy columns."""
+    if columnar.numpy is None:
+        print("columnar: NumPy is not installed")
+        return
+    db = emulator.SyntheticDatabase("G6", pages=pages)
+    dex = readdata.DexcomG6(None)
+    raw = []
+    for page in range(pages):
+        payload = db.page("EGV_DATA", page)
+        raw.extend(readdata.Dexcom.SplitPages(payload, 4, page, 1))
+
+    def objects():
+        return [
+            (r.system_time, r.glucose, r.trend_arrow)
+            for h, d in raw
+            for r in dex.ParsePage(h, d)
+        ]
+
+    def columns():
+        record_class = dex.RecordClass(raw[0][0])
+        arrays = [columnar.DecodePage(record_class, h, d) for h, d in raw]
+        return columnar.Columns(record_class, columnar.numpy.concatenate(arrays))
+
+    records = sum(h[1] for h, d in raw)
+    for name, fn in (("objects", objects), ("columns", columns)):
+        elapsed = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(
+            "decode %-8s %d records %8.2f ms %8.0f records/s"
+            % (name, records, elapsed * 1e3, records / elapsed)
+        )
+
+
+def bench_batch(pages=200):
+    """Resident bytes per record: a list of record objects versus a batch."""
+    for generation, record_type in (("G4", "EGV_DATA"), ("G6", "EGV_DATA")):
+        dex = readdata.GetDevice(None, G6=generation == "G6")
+        db = emulator.SyntheticDatabase(generation, pages=pages)
+        index = constants.RECORD_TYPES.index(record_type)
+        raw = [
+            readdata.Dexcom.SplitPages(db.page(record_type, page), index, page, 1)[0]
+            for page in range(pages)
+        ]
+        # Create the schema and row view class outside the measurements.
+        recordbatch.FromPages(dex, record_type, raw[:1])
+
+        def objects():
+            return [r for h, d in raw for r in dex.ParsePage(h, d)]
+
+        def batch():
+            return recordbatch.FromPages(dex, record_type, raw)
+
+        for name, fn in (("objects", objects), ("batch", batch)):
+            tracemalloc.start()
+            records = fn()
+            resident = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(
+                "%s %s %-8s %d records %6.1f bytes/record"
+                % (generation, record_type, name, len(records), resident / len(records))
+            )
+            del records
+
+
+def bench_records(pages=20, number=5):
+    """Records/s per record class, per-call Struct versus compiled schema."""
+    cases = (
+        ("G4", "EGV_DATA"),
+        ("G5", "EGV_DATA"),
+        ("G6", "EGV_DATA"),
+        ("G4", "SENSOR_DATA"),
+        ("G4", "METER_DATA"),
+        ("G5", "METER_DATA"),
+        ("G4", "USER_EVENT_DATA"),
+        ("G4", "INSERTION_TIME"),
+        ("G5", "INSERTION_TIME"),
+        ("G5", "CAL_SET"),
+    )
+    for generation, record_type in cases:
+        dex = readdata.GetDevice(None, G5=generation == "G5", G6=generation == "G6")
+        db = emulator.SyntheticDatabase(generation, pages=pages)
+        index = constants.RECORD_TYPES.index(record_type)
+        raw = []
+        for page in range(pages):
+            payload = db.page(record_type, page)
+            raw.extend(readdata.Dexcom.SplitPages(payload, index, page, 1))
+        cls = dex.RecordClass(raw[0][0])
+        records = sum(h[1] for h, d in raw)
+
+        def legacy():
+            for h, d in raw:
+                for _ in _legacy_records(cls, h, d):
+                    pass
+
+        def schema():
+            for h, d in raw:
+                for _ in dex.GenericRecordYielder(h, d, cls):
+                    pass
+
+        rates = []
+        for fn in (legacy, schema):
+            elapsed = min(timeit.repeat(fn, number=number, repeat=3)) / number
+            rates.append(records / elapsed)
+        print(
+            "records %-18s legacy %8.0f/s  schema %8.0f/s  x%.2f"
+            % (cls.__name__, rates[0], rates[1], rates[1] / rates[0])
+        )
+
+
+def bench_parallel(pages=1000):
+    """SENSOR_DATA pages to dicts: in process versus a worker pool."""
+    db = emulator.SyntheticDatabase("G4", pages=pages)
+    index = constants.RECORD_TYPES.index("SENSOR_DATA")
+    raw = [
+        readdata.Dexcom.SplitPages(db.page("SENSOR_DATA", page), index, page, 1)[0]
+        for page in range(pages)
+    ]
+    dex = readdata.Dexcom(None)
+
+    def serial():
+        for header, data in raw:
+            for record in dex.ParsePage(header, data):
+                json.dumps(record.to_dict(), default=util.JsonDefault)
+
+    cases = [("serial", serial)]
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        cases.append(
+            (
+                "%d workers" % workers,
+                lambda n=workers: list(parallel.ParsePagesNDJSON(raw, max_workers=n)),
+            )
+        )
+        workers *= 2
+    records = sum(header[1] for header, data in raw)
+    for name, fn in cases:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        print("parse %-10s %8.0f records/s" % (name, records / elapsed))
+
+
+BENCHMARKS = {
+    "batch": bench_batch,
+    "columnar": bench_columnar,
+    "crc16": bench_crc16,
+    "download": bench_download,
+    "metrics": bench_metrics,
+    "page_allocations": bench_page_allocations,
+    "parallel": bench_parallel,
+    "readpacket": bench_readpacket,
+    "records": bench_records,
+}
+
+
+def main(argv=None):
+    names = (argv if argv is not None else sys.argv[1:]) or sorted(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
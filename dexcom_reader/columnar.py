@@ -0,0 +1,166 @@
+"""Decode database pages into NumPy columns instead of record objects.
+
+    columns = columnar.ReadColumns(dex, "EGV_DATA")
+    columns["glucose"][columns["display_time"] > some_datetime64]
+
+Each fixed-size record class's FORMAT maps to a NumPy structured dtype, so a
+page payload decodes with a single frombuffer, and derived values (masked
+glucose, trend, datetime64 timestamps, ...) are computed a column at a time.
+NumPy is optional: install it with the "numpy" extra.
+"""
+
+import re
+
+from . import constants, database_records
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+_STRUCT_CODES = {
+    "c": "u1",
+    "b": "i1",
+    "B": "u1",
+    "?": "u1",
+    "h": "<i2",
+    "H": "<u2",
+    "i": "<i4",
+    "I": "<u4",
+    "l": "<i4",
+    "L": "<u4",
+    "q": "<i8",
+    "Q": "<u8",
+    "f": "<f4",
+    "d": "<f8",
+}
+
+_dtypes = {}
+
+
+def _RequireNumpy():
+    if numpy is None:
+        raise constants.Error(
+            "Columnar decoding needs NumPy: pip install dexcom_reader[numpy]"
+        )
+
+
+def DType(record_class):
+    """The NumPy structured dtype matching record_class.FORMAT.
+
+    Fields are named as in database_records.Schema(record_class).names.
+    """
+    _RequireNumpy()
+    dtype = _dtypes.get(record_class)
+    if dtype is not None:
+        return dtype
+    formats = []
+    for count, code in re.findall(r"(\d*)([a-zA-Z?])", record_class.FORMAT):
+        count = int(count or 1)
+        if code == "s":
+            formats.append("S%d" % count)
+        elif code in _STRUCT_CODES:
+            formats.extend([_STRUCT_CODES[code]] * count)
+        else:
+            raise constants.Error("Unsupported struct code %r" % code)
+    names = database_records.Schema(record_class).names
+    dtype = numpy.dtype(list(zip(names, formats)))
+    if dtype.itemsize != record_class._ClassSize():
+        raise constants.Error("No columnar layout for %s" % record_class.__name__)
+    _dtypes[record_class] = dtype
+    return dtype
+
+
+def DecodePage(record_class, header, data, verify=True):
+    """Decode a page payload into a structured array of header[1] records.
+
+    With verify, every record's CRC is checked first and a CrcError raised
+    on any mismatch. The array shares memory with data.
+    """
+    if verify:
+        mask = record_class.VerifyPage(data, header[1])
+        if not all(mask):
+            raise constants.CrcError(
+                "Could not parse %s at record %d"
+                % (record_class.__name__, mask.index(False))
+            )
+    return numpy.frombuffer(data, DType(record_class), count=header[1])
+
+
+def _Timestamps(seconds):
+    base = numpy.datetime64(constants.BASE_TIME, "s")
+    return base + seconds.astype("timedelta64[s]")
+
+
+def Columns(record_class, array):
+    """Turn a structured array into a dict of named column arrays.
+
+    Raw struct fields are included as they are, along with the derived
+    columns the record class exposes as properties: system_time and
+    display_time as datetime64, and per type glucose, display_only, trend
+    and is_special (EGV), meter_time (meter), event_value (events, insulin
+    scaled) or insertion_time (insertions). Enumerations such as trend,
+    event_type and session_state stay integer indexes into their tables.
+    """
+    _RequireNumpy()
+    columns = {
+        name: array[name]
+        for name in array.dtype.names
+        if name != "crc" and not re.fullmatch(r"f\d+", name)
+    }
+    columns["system_time"] = _Timestamps(array["system_seconds"])
+    columns["display_time"] = _Timestamps(array["display_seconds"])
+    if issubclass(record_class, database_records.EGVRecord):
+        full_glucose = array["full_glucose"]
+        glucose = full_glucose & constants.EGV_VALUE_MASK
+        columns["glucose"] = glucose
+        columns["display_only"] = (
+            full_glucose & constants.EGV_DISPLAY_ONLY_MASK
+        ).astype(bool)
+        columns["trend"] = array["full_trend"] & constants.EGV_TREND_ARROW_MASK
+        columns["is_special"] = numpy.isin(
+            glucose, list(constants.SPECIAL_GLUCOSE_VALUES)
+        )
+    elif issubclass(record_class, database_records.MeterRecord):
+        columns["meter_time"] = _Timestamps(array["meter_seconds"])
+    elif issubclass(record_class, database_records.EventRecord):
+        columns["display_time"] = _Timestamps(array["event_display_seconds"])
+        insulin = array["event_type"] == 2
+        columns["event_value"] = numpy.where(
+            insulin, array["event_value"] / 100.0, array["event_value"]
+        )
+    elif issubclass(record_class, database_records.InsertionRecord):
+        seconds = array["insertion_seconds"]
+        columns["insertion_time"] = _Timestamps(
+            numpy.where(seconds == 0xFFFFFFFF, array["system_seconds"], seconds)
+        )
+    return columns
+
+
+def ReadColumns(dex, record_type, pages=None, verify=True):
+    """Download record_type from dex and return it as Columns().
+
+    pages defaults to the whole range. All pages must share one record
+    layout.
+    """
+    _RequireNumpy()
+    if pages is None:
+        pages = dex.PageNumbers(record_type)
+    record_class = dex.PARSER_MAP.get(record_type)
+    arrays = []
+    for header, data in dex._iter_pages(record_type, pages):
+        page_class = dex.RecordClass(header)
+        if arrays and page_class is not record_class:
+            raise constants.Error(
+                "Page %d of %s uses %s, not %s"
+                % (header[4], record_type, page_class.__name__, record_class.__name__)
+            )
+        record_class = page_class
+        arrays.append(DecodePage(record_class, header, data, verify))
+    if record_class is None:
+        raise constants.Error("No columnar layout for %s" % record_type)
+    if arrays:
+        array = numpy.concatenate(arrays)
+    else:
+        array = numpy.empty(0, DType(record_class))
+    return Columns(record_class, array)
@@ -60,10 +60,20 @@ WRITE_CHARGER_CURRENT_SETTING = 60
 MAX_COMMAND = 61
 MAX_POSSIBLE_COMMAND = 255
 
+# Record CRC verification modes: check each record as it is built, check it
+# on first field access, or check every record of a page in one pass.
+CRC_STRICT = "strict"
+CRC_DEFERRED = "deferred"
+CRC_PAGE = "page"
+CRC_MODES = (CRC_STRICT, CRC_DEFERRED, CRC_PAGE)
+
 EGV_VALUE_MASK = 1023
 EGV_DISPLAY_ONLY_MASK = 32768
 EGV_TREND_ARROW_MASK = 15
 
+# Database pages are a fixed 28 byte header followed by 500 bytes of records.
+DATABASE_PAGE_SIZE = 528
+
 BATTERY_STATES = [None, "CHARGING", "NOT_CHARGING", "NTC_FAULT", "BAD_BATTERY"]
 
 RECORD_TYPES = [
@@ -1,3 +1,7 @@
+import binascii
+
+from . import constants
+
 # fmt: off
 TABLE = [
     0, 4129, 8258, 12387, 16516, 20645, 24774, 28903, 33032, 37161, 41290,
@@ -28,12 +32,94 @@ TABLE = [
 # fmt: on
 
 
-def crc16(buf, start=None, end=None):
+def table_crc16(buf, start=None, end=None, crc=0):
+    """Pure-Python CRC-16/XModem, one TABLE lookup per byte."""
     if start is None:
         start = 0
     if end is None:
         end = len(buf)
-    num = 0
-    for i in range(start, end):
-        num = ((num << 8) & 0xFF00) ^ TABLE[((num >> 8) & 0xFF) ^ ord(buf[i])]
+    num = crc
+    for byte in memoryview(buf)[start:end]:
+        num = ((num << 8) & 0xFF00) ^ TABLE[((num >> 8) & 0xFF) ^ byte]
     return num & 0xFFFF
+
+
+def binascii_crc16(buf, start=None, end=None, crc=0):
+    """CRC-16/XModem computed by the C implementation in binascii."""
+    if start is not None or end is not None:
+        buf = memoryview(buf)[start:end]
+    return binascii.crc_hqx(buf, crc)
+
+
+BACKENDS = {"table": table_crc16}
+if hasattr(binascii, "crc_hqx"):
+    BACKENDS["binascii"] = binascii_crc16
+
+# Standard CCITT/XModem check value (poly 0x1021, init 0).
+CHECK_INPUT = b"123456789"
+CHECK_VALUE = 0x31C3
+
+
+def _verify(fn):
+    sample = bytes(range(256))
+    try:
+        return fn(CHECK_INPUT) == CHECK_VALUE and fn(sample) == table_crc16(sample)
+    except Exception:
+        return False
+
+
+_backend_name = None
+_backend = table_crc16
+
+
+def set_backend(name):
+    """Select the CRC implementation used by crc16().
+
+    Raises constants.Error if the backend is unknown or disagrees with the
+    reference table implementation.
+    """
+    global _backend_name, _backend
+    if name not in BACKENDS:
+        raise constants.Error("Unknown crc16 backend %r" % name)
+    fn = BACKENDS[name]
+    if not _verify(fn):
+        raise constants.Error("crc16 backend %r failed self check" % name)
+    _backend_name, _backend = name, fn
+
+
+def get_backend():
+    return _backend_name
+
+
+def crc16(buf, start=None, end=None):
+    return _backend(buf, start, end)
+
+
+class Crc16:
+    """Running CRC-16/XModem over data that arrives in chunks.
+
+    Crc16(a + b).digest() == Crc16(a).update(b).digest()
+    """
+
+    def __init__(self, data=None):
+        self._crc = 0
+        if data:
+            self.update(data)
+
+    def update(self, chunk, start=None, end=None):
+        self._crc = _backend(chunk, start, end, self._crc)
+        return self
+
+    def digest(self):
+        return self._crc
+
+    def copy(self):
+        other = Crc16()
+        other._crc = self._crc
+        return other
+
+
+for _name in ("binascii", "table"):
+    if _name in BACKENDS and _verify(BACKENDS[_name]):
+        set_backend(_name)
+        break
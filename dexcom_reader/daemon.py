@@ -0,0 +1,262 @@
+"""Share one receiver connection between many local clients.
+
+    python -m dexcom_reader.daemon --socket /run/dexcom.sock [--port /dev/ttyACM0]
+
+The daemon owns the serial port and answers newline-delimited JSON requests
+on a Unix domain socket:
+
+    {"method": "ReadBatteryLevel"}
+    {"method": "ReadRecords", "params": {"record_type": "EGV_DATA"}}
+    {"method": "SyncRecords",
+     "params": {"record_type": "EGV_DATA", "consumer": "uploader"}}
+
+Each answer is {"result": ...} or {"error": "..."}. Requests are run one at a
+time against the receiver, and a request identical to one already in flight
+waits for and shares that request's answer instead of being sent again.
+
+SyncRecords returns only the records not returned to the same consumer by an
+earlier SyncRecords call. Each consumer (an uploader, a dashboard, ...) names
+itself and has its own high-water marks per receiver, kept in the --state
+file (see sync.py). The marks advance only once the answer has been written
+to the client, so records lost with a dropped connection are sent again.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from . import constants, readdata, responsecache, sync, util
+
+# Dexcom methods clients may call.
+METHODS = (
+    "Ping",
+    "ReadTransmitterId",
+    "ReadLanguage",
+    "ReadBatteryLevel",
+    "ReadBatteryState",
+    "ReadRTC",
+    "ReadSystemTime",
+    "ReadSystemTimeOffset",
+    "ReadDisplayTimeOffset",
+    "ReadDisplayTime",
+    "ReadGlucoseUnit",
+    "ReadClockMode",
+    "ReadBlindedMode",
+    "ReadChargerCurrentSetting",
+    "GetFirmwareHeader",
+    "GetFirmwareSettings",
+    "ReadManufacturingData",
+    "ReadDatabasePageRange",
+    "ReadRecords",
+    "SyncRecords",
+)
+
+
+class _Coalescer:
+    """Run fn once per key at a time; concurrent callers share the result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.coalesced = 0
+
+    def run(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+class ReceiverService:
+    """The daemon's view of one receiver: serialised, coalesced, cached."""
+
+    def __init__(self, dex, max_age=60, state=None):
+        self.dex = dex
+        if dex.cache is None:
+            dex.cache = responsecache.ResponseCache()
+        self.max_age = max_age
+        self._device_lock = threading.Lock()
+        self._coalescer = _Coalescer()
+        self._records = {}
+        self.state = state if state is not None else sync.SyncState()
+
+    def _device(self, fn, *args, **kwargs):
+        with self._device_lock:
+            try:
+                return fn(*args, **kwargs)
+            except constants.Error:
+                self.dex.resync()
+                raise
+
+    def ReadRecords(self, record_type):
+        """Records of record_type, refreshed when older than max_age."""
+        cached = self._records.get(record_type)
+        if cached is not None and time.monotonic() - cached[0] < self.max_age:
+            return cached[1]
+        records = self._device(self.dex.ReadRecords, record_type)
+        self._records[record_type] = (time.monotonic(), records)
+        return records
+
+    def _SyncRecords(self, record_type, consumer):
+        serial_number = "%s/%s" % (self.dex.ReadSerialNumber(), consumer)
+        return sync.ReadNew(self.dex, record_type, self.state, serial_number)
+
+    def SyncRecords(self, record_type, consumer):
+        """Records of record_type newer than those delivered to consumer.
+
+        Returns (records, delivered). consumer's marks advance, and are saved,
+        only when delivered() is called once the records have been sent.
+        """
+        records, advance = self._device(self._SyncRecords, record_type, consumer)
+
+        def delivered():
+            advance()
+            self.state.Save()
+
+        return records, delivered
+
+    def Call(self, method, params=None):
+        """Run method; return (result, delivered).
+
+        delivered is None, or for SyncRecords the function to call once result
+        has reached the client.
+        """
+        if method not in METHODS:
+            raise constants.Error("Unknown method %r" % method)
+        params = params or {}
+        key = (method, json.dumps(params, sort_keys=True))
+        if method == "SyncRecords":
+            return self._coalescer.run(key, lambda: self.SyncRecords(**params))
+        if method == "ReadRecords":
+            result = self._coalescer.run(key, lambda: self.ReadRecords(**params))
+        else:
+            fn = getattr(self.dex, method)
+            result = self._coalescer.run(key, lambda: self._device(fn, **params))
+        return result, None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            delivered = None
+            try:
+                request = json.loads(line)
+                result, delivered = self.server.service.Call(
+                    request["method"], request.get("params")
+                )
+                response = {"result": result}
+            except Exception as e:
+                response = {"error": "%s: %s" % (type(e).__name__, e)}
+            self.wfile.write(
+                json.dumps(response, default=util.JsonDefault).encode() + b"\n"
+            )
+            self.wfile.flush()
+            if delivered is not None:
+                delivered()
+
+
+class ReceiverDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.service = service
+        socketserver.UnixStreamServer.__init__(self, socket_path, _Handler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class DaemonClient:
+    """Talk to a ReceiverDaemon over its socket.
+
+    Results come back as JSON: records as to_dict() dicts, times as ISO
+    strings, XML headers as attribute dicts.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+        self._file = self._sock.makefile("rwb")
+
+    def SyncRecords(self, record_type, consumer):
+        """Records of record_type newer than consumer's last SyncRecords."""
+        return self.Call("SyncRecords", record_type=record_type, consumer=consumer)
+
+    def Call(self, method, **params):
+        request = {"method": method, "params": params}
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        response = json.loads(self._file.readline())
+        if "error" in response:
+            raise constants.Error(response["error"])
+        return response["result"]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", required=True, help="Unix socket to listen on")
+    parser.add_argument("--port", help="receiver tty (default: first found)")
+    parser.add_argument("--g5", action="store_true", help="G5 receiver")
+    parser.add_argument("--g6", action="store_true", help="G6 receiver")
+    parser.add_argument(
+        "--max-age", type=float, default=60, help="seconds to reuse records"
+    )
+    parser.add_argument("--state", help="file keeping SyncRecords high-water marks")
+    args = parser.parse_args(argv)
+    port = args.port or readdata.Dexcom.FindDevice()
+    if not port:
+        parser.error("Could not find Dexcom Receiver!")
+    dex = readdata.GetDevice(port, G5=args.g5, G6=args.g6, timeout=5, retries=3)
+    server = ReceiverDaemon(
+        args.socket,
+        ReceiverService(dex, max_age=args.max_age, state=sync.SyncState(args.state)),
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dex.Disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,71 @@
 import binascii
+import collections
+import re
 import struct
 
 from . import constants, crc16, util
 
+# first index (uint), numrec (uint), record_type (byte), revision (byte),
+# page# (uint), r1 (uint), r2 (uint), r3 (uint), ushort (Crc)
+PAGE_HEADER = struct.Struct("<2I2B4IH")
+PageHeader = collections.namedtuple(
+    "PageHeader",
+    "first_index record_count record_type revision page_number r1 r2 r3 crc",
+)
+
+
+class RecordSchema:
+    """The compiled layout of a record class's FORMAT.
+
+    struct is the precompiled Struct, names the name of each unpacked field
+    (from the class's STRUCT_FIELDS, else f<index>; a trailing unnamed H
+    is "crc"), codes its struct code, offsets its byte offset, and index
+    maps names back to positions in record.data.
+    """
+
+    __slots__ = ("struct", "size", "names", "codes", "offsets", "index")
+
+    def __init__(self, record_class):
+        record_class._CheckFormat()
+        self.struct = struct.Struct(record_class.FORMAT)
+        self.size = self.struct.size
+        byte_order, codes = record_class.FORMAT[0], []
+        for count, code in re.findall(r"(\d*)([a-zA-Z?])", record_class.FORMAT):
+            if code in "sp":
+                codes.append(count + code)
+            else:
+                codes.extend([code] * int(count or 1))
+        declared = record_class.STRUCT_FIELDS
+        names = ["f%d" % i for i in range(len(codes))]
+        if record_class.FORMAT.endswith("H"):
+            names[-1] = "crc"
+        for i, name in declared.items():
+            names[i] = name
+        self.names = tuple(names)
+        self.codes = tuple(codes)
+        self.offsets = tuple(
+            struct.calcsize(byte_order + "".join(codes[:i]))
+            for i in range(len(codes))
+        )
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+
+_schemas = {}
+
+
+def Schema(record_class):
+    """The RecordSchema of record_class, compiled on first use."""
+    schema = _schemas.get(record_class)
+    if schema is None:
+        schema = _schemas[record_class] = RecordSchema(record_class)
+    return schema
+
 
 class BaseDatabaseRecord:
+    __slots__ = ("_raw", "_index", "_data", "_crc_pending")
     FORMAT = None
+    # Names of FORMAT's fields by their index in data; see RecordSchema.
+    STRUCT_FIELDS = {}
 
     @classmethod
     def _CheckFormat(cls):
@@ -16,12 +76,11 @@ class BaseDatabaseRecord:
 
     @classmethod
     def _ClassFormat(cls):
-        cls._CheckFormat()
-        return struct.Struct(cls.FORMAT)
+        return Schema(cls).struct
 
     @classmethod
     def _ClassSize(cls):
-        return cls._ClassFormat().size
+        return Schema(cls).size
 
     @property
     def FMT(self):
@@ -36,10 +95,47 @@ class BaseDatabaseRecord:
     def crc(self):
         return self.data[-1]
 
-    def __init__(self, data, raw_data):
-        self.raw_data = raw_data
+    def __init__(self, data, raw_data, crc_mode=constants.CRC_STRICT, index=None):
+        """data is the unpacked FORMAT, raw_data the record's bytes.
+
+        With index, raw_data is instead a page payload holding the record
+        as its index-th, so the records of a page share one buffer rather
+        than each copying its own slice; raw_data is then sliced on access.
+        """
+        self._raw = raw_data
+        self._index = index
         self.data = data
-        self.check_crc()
+        self._crc_pending = crc_mode == constants.CRC_DEFERRED
+        if crc_mode == constants.CRC_STRICT:
+            self.check_crc()
+
+    @property
+    def raw_data(self):
+        if self._index is None:
+            return self._raw
+        size = self._ClassSize()
+        start = self._index * size
+        return self._raw[start : start + size]
+
+    @raw_data.setter
+    def raw_data(self, value):
+        self._raw = value
+        self._index = None
+
+    @property
+    def data(self):
+        if self._crc_pending:
+            self._crc_pending = False
+            try:
+                self.check_crc()
+            except constants.CrcError:
+                self._crc_pending = True
+                raise
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
 
     def check_crc(self):
         local_crc = self.calculate_crc()
@@ -47,20 +143,44 @@ class BaseDatabaseRecord:
             raise constants.CrcError("Could not parse %s" % self.__class__.__name__)
 
     def dump(self):
-        return "".join("\\x%02x" % ord(c) for c in self.raw_data)
+        return "".join("\\x%02x" % c for c in self.raw_data)
 
     def calculate_crc(self):
-        return crc16.crc16(self.raw_data[:-2])
+        if self._index is None:
+            raw_data = self.raw_data
+            return crc16.crc16(raw_data, 0, len(raw_data) - 2)
+        size = self._ClassSize()
+        start = self._index * size
+        return crc16.crc16(self._raw, start, start + size - 2)
 
     @classmethod
-    def Create(cls, data, record_counter):
-        offset = record_counter * cls._ClassSize()
-        raw_data = data[offset : offset + cls._ClassSize()]
+    def Create(cls, data, record_counter, crc_mode=constants.CRC_STRICT):
+        size = cls._ClassSize()
+        offset = record_counter * size
+        raw_data = bytes(data[offset : offset + size])
         unpacked_data = cls._ClassFormat().unpack(raw_data)
-        return cls(unpacked_data, raw_data)
+        return cls(unpacked_data, raw_data, crc_mode)
+
+    @classmethod
+    def VerifyPage(cls, data, count):
+        """Check the CRC of count consecutive records in a page payload.
+
+        Returns a list of booleans, one per record, True where the stored
+        CRC matches.
+        """
+        size = cls._ClassSize()
+        view = memoryview(data)
+        mask = []
+        for offset in range(0, count * size, size):
+            crc_offset = offset + size - 2
+            (stored,) = struct.unpack_from("<H", view, crc_offset)
+            mask.append(crc16.crc16(view, offset, crc_offset) == stored)
+        return mask
 
 
 class GenericTimestampedRecord(BaseDatabaseRecord):
+    __slots__ = ()
+    STRUCT_FIELDS = {0: "system_seconds", 1: "display_seconds"}
     FIELDS = []
     BASE_FIELDS = ["system_time", "display_time"]
 
@@ -82,17 +202,25 @@ class GenericTimestampedRecord(BaseDatabaseRecord):
 
 
 class GenericXMLRecord(GenericTimestampedRecord):
+    __slots__ = ()
     FORMAT = "<II490sH"
+    STRUCT_FIELDS = {**GenericTimestampedRecord.STRUCT_FIELDS, 2: "xml"}
 
     @property
     def xmldata(self):
-        data = self.data[2].replace("\x00", "")
+        data = self.data[2].replace(b"\x00", b"")
         return data
 
 
 class InsertionRecord(GenericTimestampedRecord):
+    __slots__ = ()
     FIELDS = ["insertion_time", "session_state"]
     FORMAT = "<3IcH"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "insertion_seconds",
+        3: "session_state",
+    }
 
     @property
     def insertion_time(self):
@@ -129,11 +257,21 @@ class InsertionRecord(GenericTimestampedRecord):
 
 
 class G5InsertionRecord(InsertionRecord):
+    __slots__ = ()
     FORMAT = "<3Ic10BH"
 
 
 class Calibration(GenericTimestampedRecord):
+    __slots__ = ("page_data", "subcals")
     FORMAT = "<2Iddd3cdb"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "slope",
+        3: "intercept",
+        4: "scale",
+        8: "decay",
+        9: "numsub",
+    }
     # CAL_FORMAT = '<2Iddd3cdb'
     FIELDS = ["slope", "intercept", "scale", "decay", "numsub", "raw"]
 
@@ -173,22 +311,21 @@ class Calibration(GenericTimestampedRecord):
         return cls.REV_2_SIZE
 
     @classmethod
-    def Create(cls, data, record_counter):
-        offset = record_counter * cls._ClassSize()
-        cal_size = struct.calcsize(cls.FORMAT)
-        raw_data = data[offset : offset + cls._ClassSize()]
-
-        cal_data = data[offset : offset + cal_size]
-        unpacked_data = cls._ClassFormat().unpack(cal_data)
-        return cls(unpacked_data, raw_data)
-
-    def __init__(self, data, raw_data):
+    def Create(cls, data, record_counter, crc_mode=constants.CRC_STRICT):
+        size = cls._ClassSize()
+        offset = record_counter * size
+        raw_data = bytes(data[offset : offset + size])
+        unpacked_data = cls._ClassFormat().unpack_from(raw_data)
+        return cls(unpacked_data, raw_data, crc_mode)
+
+    def __init__(self, data, raw_data, crc_mode=constants.CRC_STRICT):
+        self._crc_pending = False
         self.page_data = raw_data
         self.raw_data = raw_data
         self.data = data
-        subsize = struct.calcsize(SubCal.FORMAT)
+        subsize = SubCal._ClassSize()
         offset = self.numsub * subsize
-        calsize = struct.calcsize(self.FORMAT)
+        calsize = Schema(type(self)).size
         # caldata = raw_data[:calsize]
         subdata = raw_data[calsize : calsize + offset]
         # crcdata = raw_data[calsize + offset : calsize + offset + 2]
@@ -202,7 +339,9 @@ class Calibration(GenericTimestampedRecord):
 
         self.subcals = subcals
 
-        self.check_crc()
+        self._crc_pending = crc_mode == constants.CRC_DEFERRED
+        if crc_mode == constants.CRC_STRICT:
+            self.check_crc()
 
     def to_dict(self):
         res = super().to_dict()
@@ -215,6 +354,8 @@ class Calibration(GenericTimestampedRecord):
 
 
 class LegacyCalibration(Calibration):
+    __slots__ = ()
+
     @classmethod
     def _ClassSize(cls):
 
@@ -222,7 +363,14 @@ class LegacyCalibration(Calibration):
 
 
 class SubCal(GenericTimestampedRecord):
+    __slots__ = ("displayOffset",)
     FORMAT = "<IIIIc"
+    STRUCT_FIELDS = {
+        0: "entered_seconds",
+        1: "meter",
+        2: "sensor",
+        3: "applied_seconds",
+    }
     BASE_FIELDS = []
     FIELDS = [
         "entered",
@@ -232,6 +380,7 @@ class SubCal(GenericTimestampedRecord):
     ]
 
     def __init__(self, raw_data, displayOffset=None):
+        self._crc_pending = False
         self.raw_data = raw_data
         self.data = self._ClassFormat().unpack(raw_data)
         self.displayOffset = displayOffset
@@ -254,7 +403,13 @@ class SubCal(GenericTimestampedRecord):
 
 
 class MeterRecord(GenericTimestampedRecord):
+    __slots__ = ()
     FORMAT = "<2IHIH"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "meter_glucose",
+        3: "meter_seconds",
+    }
     FIELDS = ["meter_glucose", "meter_time"]
 
     @property
@@ -270,12 +425,21 @@ class MeterRecord(GenericTimestampedRecord):
 
 
 class G5MeterRecord(MeterRecord):
+    __slots__ = ()
     FORMAT = "<2IHI5BH"
 
 
 class EventRecord(GenericTimestampedRecord):
+    __slots__ = ()
     # sys_time,display_time,glucose,meter_time,crc
     FORMAT = "<2I2c2IH"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "event_type",
+        3: "event_sub_type",
+        4: "event_display_seconds",
+        5: "event_value",
+    }
     FIELDS = ["event_type", "event_sub_type", "event_value"]
 
     @property
@@ -318,9 +482,16 @@ class EventRecord(GenericTimestampedRecord):
 
 
 class SensorRecord(GenericTimestampedRecord):
+    __slots__ = ()
     # uint, uint, uint, uint, ushort
     # (system_seconds, display_seconds, unfiltered, filtered, rssi, crc)
     FORMAT = "<2IIIhH"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "unfiltered",
+        3: "filtered",
+        4: "rssi",
+    }
     # (unfiltered, filtered, rssi)
     FIELDS = ["unfiltered", "filtered", "rssi"]
 
@@ -338,10 +509,16 @@ class SensorRecord(GenericTimestampedRecord):
 
 
 class EGVRecord(GenericTimestampedRecord):
+    __slots__ = ()
     # uint, uint, ushort, byte, ushort
     # (system_seconds, display_seconds, glucose, trend_arrow, crc)
     FIELDS = ["glucose", "trend_arrow"]
     FORMAT = "<2IHcH"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "full_glucose",
+        3: "full_trend",
+    }
 
     @property
     def full_glucose(self):
@@ -383,7 +560,13 @@ class EGVRecord(GenericTimestampedRecord):
 
 
 class G5EGVRecord(EGVRecord):
+    __slots__ = ()
     FORMAT = "<2IHBBBBBBBBBcBH"
+    STRUCT_FIELDS = {
+        **GenericTimestampedRecord.STRUCT_FIELDS,
+        2: "full_glucose",
+        12: "full_trend",
+    }
 
     @property
     def full_trend(self):
@@ -391,4 +574,5 @@ class G5EGVRecord(EGVRecord):
 
 
 class G6EGVRecord(G5EGVRecord):
+    __slots__ = ()
     FORMAT = "<2IHBBBBBBBBBcBBBH"
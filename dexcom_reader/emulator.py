@@ -0,0 +1,393 @@
+"""A receiver emulator for benchmarks and load tests without hardware.
+
+    with emulator.ReceiverEmulator(emulator.SyntheticDatabase("G6")) as rx:
+        dex = readdata.DexcomG6(rx.port)
+        dex.ReadRecords("EGV_DATA")
+
+ReceiverEmulator answers the same framed commands a receiver does on a
+pseudo-terminal, so the real serial.Serial path is exercised end to end.
+"""
+
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from . import constants, crc16, database_records, framereader, packetwriter
+
+NO_PAGES = (0xFFFFFFFF, 0xFFFFFFFF)
+
+# record type -> (record class, page revision) for each receiver generation.
+GENERATIONS = {
+    "G4": {
+        "MANUFACTURING_DATA": (database_records.GenericXMLRecord, 1),
+        "PC_SOFTWARE_PARAMETER": (database_records.GenericXMLRecord, 1),
+        "SENSOR_DATA": (database_records.SensorRecord, 1),
+        "EGV_DATA": (database_records.EGVRecord, 2),
+        "CAL_SET": (database_records.LegacyCalibration, 1),
+        "INSERTION_TIME": (database_records.InsertionRecord, 1),
+        "METER_DATA": (database_records.MeterRecord, 2),
+        "USER_EVENT_DATA": (database_records.EventRecord, 1),
+    },
+    "G5": {
+        "MANUFACTURING_DATA": (database_records.GenericXMLRecord, 1),
+        "PC_SOFTWARE_PARAMETER": (database_records.GenericXMLRecord, 1),
+        "SENSOR_DATA": (database_records.SensorRecord, 1),
+        "EGV_DATA": (database_records.G5EGVRecord, 4),
+        "CAL_SET": (database_records.Calibration, 2),
+        "INSERTION_TIME": (database_records.G5InsertionRecord, 2),
+        "METER_DATA": (database_records.G5MeterRecord, 3),
+        "USER_EVENT_DATA": (database_records.EventRecord, 1),
+    },
+    "G6": {
+        "MANUFACTURING_DATA": (database_records.GenericXMLRecord, 1),
+        "PC_SOFTWARE_PARAMETER": (database_records.GenericXMLRecord, 1),
+        "SENSOR_DATA": (database_records.SensorRecord, 1),
+        "EGV_DATA": (database_records.G6EGVRecord, 5),
+        "CAL_SET": (database_records.Calibration, 3),
+        "INSERTION_TIME": (database_records.G5InsertionRecord, 3),
+        "METER_DATA": (database_records.G5MeterRecord, 3),
+        "USER_EVENT_DATA": (database_records.EventRecord, 1),
+    },
+}
+
+PRODUCT_NAMES = {
+    "G4": "Dexcom G4 Receiver",
+    "G5": "Dexcom G5 Mobile Receiver",
+    "G6": "Dexcom G6 Receiver",
+}
+
+
+def _fields(cls, i, t):
+    """Synthetic field values (without the trailing CRC) for record i."""
+    glucose = 40 + (i * 7) % 360
+    trend = bytes([1 + i % 7])
+    if issubclass(cls, database_records.EGVRecord):
+        if issubclass(cls, database_records.G6EGVRecord):
+            return (t, t, glucose) + (0,) * 9 + (trend, 0, 0, 0)
+        if issubclass(cls, database_records.G5EGVRecord):
+            return (t, t, glucose) + (0,) * 9 + (trend, 0)
+        return (t, t, glucose, trend)
+    if cls is database_records.SensorRecord:
+        return (t, t, 150000 + i, 149000 + i, -60)
+    if issubclass(cls, database_records.MeterRecord):
+        extra = (0,) * 5 if cls is database_records.G5MeterRecord else ()
+        return (t, t, glucose, t) + extra
+    if cls is database_records.EventRecord:
+        return (t, t, bytes([1 + i % 4]), b"\x00", t, 10 * (i % 20))
+    if issubclass(cls, database_records.InsertionRecord):
+        extra = (0,) * 10 if cls is database_records.G5InsertionRecord else ()
+        return (t, t, t, bytes([7])) + extra
+    if issubclass(cls, database_records.Calibration):
+        return (t, t, 1000.0, 30000.0, 1.0, b"\x00", b"\x00", b"\x00", 1.0, 0)
+    raise NotImplementedError("No synthetic data for %s" % cls.__name__)
+
+
+def PackRecord(cls, values):
+    """Pack values into a cls record of cls._ClassSize() bytes with its CRC."""
+    fmt = cls.FORMAT[:-1] if cls.FORMAT.endswith("H") else cls.FORMAT
+    body = struct.pack(fmt, *values)
+    body += b"\x00" * (cls._ClassSize() - 2 - len(body))
+    return body + struct.pack("<H", crc16.crc16(body))
+
+
+def PackPage(record_type, revision, page, first_index, records):
+    """Build a full database page: header, records, then 0xFF padding."""
+    header = database_records.PAGE_HEADER
+    raw = header.pack(
+        first_index,
+        len(records),
+        constants.RECORD_TYPES.index(record_type),
+        revision,
+        page,
+        0,
+        0,
+        0,
+        0,
+    )
+    raw = raw[:-2] + struct.pack("<H", crc16.crc16(raw, 0, header.size - 2))
+    body = b"".join(records)
+    padding = b"\xff" * (constants.DATABASE_PAGE_SIZE - len(raw) - len(body))
+    return raw + body + padding
+
+
+class SyntheticDatabase:
+    """Deterministic receiver database for one generation (G4, G5 or G6).
+
+    pages is either a page count used for every record type with generated
+    records, or a dict of record type -> page count. Records are spaced
+    interval seconds apart, starting at receiver time start, and the last
+    page of each type is only half full, like a receiver still writing it.
+    """
+
+    def __init__(
+        self,
+        generation="G4",
+        pages=4,
+        start=300000000,
+        interval=300,
+        serial_number="SM12345678",
+    ):
+        self.generation = generation
+        self.layout = GENERATIONS[generation]
+        self.start = start
+        self.interval = interval
+        self.serial_number = serial_number
+        self._counts = {}
+        for record_type, (cls, _) in self.layout.items():
+            if cls is database_records.GenericXMLRecord:
+                self._counts[record_type] = 1
+                continue
+            n = pages.get(record_type, 0) if isinstance(pages, dict) else pages
+            per_page = self.records_per_page(record_type)
+            self._counts[record_type] = max(0, n * per_page - per_page // 2)
+        self._pages = {}
+
+    def records_per_page(self, record_type):
+        cls, _ = self.layout[record_type]
+        size = constants.DATABASE_PAGE_SIZE - database_records.PAGE_HEADER.size
+        return size // cls._ClassSize()
+
+    def record_count(self, record_type):
+        return self._counts.get(record_type, 0)
+
+    def append(self, record_type, count=1):
+        """Add count new records to the end of record_type's pages."""
+        per_page = self.records_per_page(record_type)
+        last = (self._counts[record_type] - 1) // per_page
+        self._counts[record_type] += count
+        for page in range(max(0, last), self.page_range(record_type)[1] + 1):
+            self._pages.pop((record_type, page), None)
+
+    def system_time(self, record_type, index):
+        return self.start + index * self.interval
+
+    def page_range(self, record_type):
+        count = self.record_count(record_type)
+        if not count:
+            return NO_PAGES
+        return 0, (count - 1) // self.records_per_page(record_type)
+
+    def _xml(self, record_type):
+        if record_type == "MANUFACTURING_DATA":
+            xml = '<ManufacturingParameters SerialNumber="%s" />'
+            return (xml % self.serial_number).encode()
+        return b'<PCParameterRecord SystemTimeOffset="0" />'
+
+    def page(self, record_type, page):
+        key = (record_type, page)
+        if key not in self._pages:
+            first, last = self.page_range(record_type)
+            if (first, last) == NO_PAGES or not first <= page <= last:
+                raise IndexError("No page %d for %s" % (page, record_type))
+            cls, revision = self.layout[record_type]
+            per_page = self.records_per_page(record_type)
+            first_index = page * per_page
+            stop = min(first_index + per_page, self.record_count(record_type))
+            records = []
+            for i in range(first_index, stop):
+                t = self.system_time(record_type, i)
+                if cls is database_records.GenericXMLRecord:
+                    values = (t, t, self._xml(record_type))
+                else:
+                    values = _fields(cls, i, t)
+                records.append(PackRecord(cls, values))
+            self._pages[key] = PackPage(
+                record_type, revision, page, first_index, records
+            )
+        return self._pages[key]
+
+    def page_header(self, record_type, page):
+        return self.page(record_type, page)[: database_records.PAGE_HEADER.size]
+
+
+def Frame(command, payload=None):
+    p = packetwriter.PacketWriter()
+    p.ComposePacket(command, payload)
+    return p.PacketString()
+
+
+class ReceiverEmulator:
+    """Serve a SyntheticDatabase over a pseudo-terminal.
+
+    byte_delay is slept per byte written back (1 / 11520 approximates 115200
+    baud), command_delay once per command. error_rate is the probability
+    that a response has one bit flipped past its length field, which the
+    client sees as a CRC failure. truncate_rate is the probability that a
+    response is cut short, which the client sees as a read timeout.
+    """
+
+    def __init__(
+        self,
+        database=None,
+        byte_delay=0.0,
+        command_delay=0.0,
+        error_rate=0.0,
+        truncate_rate=0.0,
+        seed=None,
+    ):
+        self.database = database or SyntheticDatabase()
+        self.byte_delay = byte_delay
+        self.command_delay = command_delay
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self._random = random.Random(seed)
+        self.display_time_offset = -3600
+        self.commands = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.errors_injected = 0
+        self._master = self._slave = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def port(self):
+        return os.ttyname(self._slave)
+
+    def _firmware_header(self):
+        return (
+            '<FirmwareHeader SchemaVersion="1" ApiVersion="3.1.0.0" '
+            'ProductId="%sReceiver" ProductName="%s" FirmwareVersion="5.0.1.043" />'
+            % (self.database.generation, PRODUCT_NAMES[self.database.generation])
+        ).encode()
+
+    def _status(self, command):
+        now = self.database.start + 86400
+        return {
+            constants.READ_TRANSMITTER_ID: b"6ABCDE",
+            constants.READ_LANGUAGE: struct.pack("<H", 1033),
+            constants.READ_BATTERY_LEVEL: struct.pack("<I", 83),
+            constants.READ_BATTERY_STATE: bytes([2]),
+            constants.READ_RTC: struct.pack("<I", now),
+            constants.READ_SYSTEM_TIME: struct.pack("<I", now),
+            constants.READ_SYSTEM_TIME_OFFSET: struct.pack("<i", 0),
+            constants.READ_DISPLAY_TIME_OFFSET: struct.pack(
+                "<i", self.display_time_offset
+            ),
+            constants.READ_GLUCOSE_UNIT: bytes([1]),
+            constants.READ_CLOCK_MODE: bytes([0]),
+            constants.READ_BLINDED_MODE: bytes([0]),
+            constants.READ_DEVICE_MODE: bytes([0]),
+            constants.READ_HARDWARE_BOARD_ID: bytes([4]),
+            constants.READ_CHARGER_CURRENT_SETTING: bytes([2]),
+            constants.READ_FIRMWARE_HEADER: self._firmware_header(),
+            constants.READ_FIRMWARE_SETTINGS: b"<FirmwareSettings />",
+            constants.READ_DATABASE_PARTITION_INFO: b"<PartitionInfo />",
+        }.get(command)
+
+    def handle(self, command, payload):
+        """Return the response frame for one request."""
+        self.commands[command] = self.commands.get(command, 0) + 1
+        db = self.database
+        try:
+            if command == constants.PING:
+                return Frame(constants.ACK)
+            if command == constants.READ_DATABASE_PAGE_RANGE:
+                record_type = constants.RECORD_TYPES[payload[0]]
+                return Frame(
+                    constants.ACK, struct.pack("<II", *db.page_range(record_type))
+                )
+            if command == constants.READ_DATABASE_PAGES:
+                index, page, count = struct.unpack_from("<BIB", payload)
+                record_type = constants.RECORD_TYPES[index]
+                pages = [db.page(record_type, p) for p in range(page, page + count)]
+                return Frame(constants.ACK, b"".join(pages))
+            if command == constants.READ_DATABASE_PAGE_HEADER:
+                index, page = struct.unpack_from("<BI", payload)
+                record_type = constants.RECORD_TYPES[index]
+                return Frame(constants.ACK, db.page_header(record_type, page))
+            if command == constants.WRITE_DISPLAY_TIME_OFFSET:
+                (self.display_time_offset,) = struct.unpack_from("<i", payload)
+                return Frame(constants.ACK)
+        except (IndexError, KeyError, struct.error):
+            return Frame(constants.INVALID_PARAM)
+        status = self._status(command)
+        if status is None:
+            return Frame(constants.INVALID_COMMAND)
+        return Frame(constants.ACK, status)
+
+    def _respond(self, request):
+        command, payload = framereader.decode_frame(memoryview(request))
+        response = bytearray(self.handle(command, payload))
+        if self.error_rate and self._random.random() < self.error_rate:
+            # Leave SOF and length alone so the client still reads a whole
+            # frame and fails its CRC rather than waiting for more bytes.
+            bit = self._random.randrange(8 * (len(response) - 3))
+            response[3 + bit // 8] ^= 1 << (bit % 8)
+            self.errors_injected += 1
+        if self.truncate_rate and self._random.random() < self.truncate_rate:
+            del response[self._random.randrange(1, len(response)) :]
+            self.errors_injected += 1
+        delay = self.command_delay + self.byte_delay * len(response)
+        if delay:
+            time.sleep(delay)
+        return bytes(response)
+
+    def _serve(self):
+        buf = bytearray()
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(self._master, 4096)
+            except OSError:
+                return
+            self.bytes_in += len(chunk)
+            buf += chunk
+            for request in self._frames(buf):
+                try:
+                    response = self._respond(request)
+                except constants.CrcError:
+                    response = Frame(constants.INCOMPLETE_PACKET_RECEIVED)
+                os.write(self._master, response)
+                self.bytes_out += len(response)
+
+    @staticmethod
+    def _frames(buf):
+        """Take each complete request frame off the front of buf.
+
+        Bytes that cannot start a frame are dropped; a partial frame is left
+        in buf for the next read.
+        """
+        while len(buf) >= framereader.HEADER_LEN:
+            try:
+                length = framereader.frame_length(buf)
+            except constants.Error:
+                del buf[:1]
+                continue
+            if len(buf) < length:
+                return
+            request = bytes(buf[:length])
+            del buf[:length]
+            yield request
+
+    def start(self):
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._serve, name="dexcom-emulator", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
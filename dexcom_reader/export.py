@@ -0,0 +1,141 @@
+"""Stream receiver records to NDJSON or CSV without holding them in memory.
+
+    python -m dexcom_reader.export -o egv.ndjson.gz EGV_DATA SENSOR_DATA
+    python -m dexcom_reader.export --format csv -o - METER_DATA
+
+Records are read a page at a time with Dexcom.iter_records, oldest first,
+converted with to_dict() and written through a buffered (optionally gzip)
+stream, so memory use stays flat however many pages the receiver holds.
+Each row carries a record_type column; CSV output has the union of the
+requested types' fields as its columns.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+
+from . import database_records, readdata, util
+
+FORMATS = ("ndjson", "csv")
+BUFFER_SIZE = 1 << 16
+
+
+def OpenOutput(path, compress=None):
+    """A text stream for path: "-" is stdout, and *.gz (or compress) gzips."""
+    if compress is None:
+        compress = path.endswith(".gz")
+    if path == "-":
+        # Closing the export stream must leave sys.stdout open.
+        sys.stdout.flush()
+        raw = open(sys.stdout.fileno(), "wb", buffering=BUFFER_SIZE, closefd=False)
+        if compress:
+            raw = gzip.GzipFile(fileobj=raw, mode="wb")
+    elif compress:
+        raw = gzip.open(path, "wb")
+    else:
+        raw = open(path, "wb", buffering=BUFFER_SIZE)
+    return io.TextIOWrapper(
+        io.BufferedWriter(raw, BUFFER_SIZE) if compress else raw,
+        encoding="utf-8",
+        newline="",
+    )
+
+
+def CsvColumns(dex, record_types):
+    columns = ["record_type"]
+    for record_type in record_types:
+        cls = dex.PARSER_MAP.get(record_type, database_records.GenericXMLRecord)
+        names = cls.BASE_FIELDS + cls.FIELDS
+        if issubclass(cls, database_records.Calibration):
+            names = names + ["subrecords"]
+        columns.extend(name for name in names if name not in columns)
+    return columns
+
+
+def _Cell(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=util.JsonDefault)
+    if isinstance(value, (bytes, bytearray)):
+        return util.JsonDefault(value)
+    return value
+
+
+class NDJSONWriter:
+    def __init__(self, stream, dex=None, record_types=()):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, default=util.JsonDefault))
+        self.stream.write("\n")
+
+
+class CSVWriter:
+    def __init__(self, stream, dex, record_types):
+        self._writer = csv.DictWriter(
+            stream, CsvColumns(dex, record_types), extrasaction="ignore"
+        )
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow({key: _Cell(value) for key, value in row.items()})
+
+
+WRITERS = {"ndjson": NDJSONWriter, "csv": CSVWriter}
+
+
+def Export(dex, record_types, stream, output_format="ndjson"):
+    """Write every record of record_types to stream, oldest first per type.
+
+    Returns the number of records written for each record type.
+    """
+    if output_format not in WRITERS:
+        raise ValueError("Unknown export format %r" % output_format)
+    writer = WRITERS[output_format](stream, dex, record_types)
+    counts = {}
+    for record_type in record_types:
+        count = 0
+        for record in dex.iter_records(record_type, reverse=False):
+            row = record.to_dict()
+            row["record_type"] = record_type
+            writer.write(row)
+            count += 1
+        counts[record_type] = count
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("record_types", nargs="+", metavar="RECORD_TYPE")
+    parser.add_argument("-o", "--output", default="-", help="file, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true", default=None)
+    parser.add_argument("--port", help="receiver tty (default: first found)")
+    parser.add_argument("--g5", action="store_true", help="G5 receiver")
+    parser.add_argument("--g6", action="store_true", help="G6 receiver")
+    parser.add_argument(
+        "--timeout", type=float, default=5, help="serial read timeout in seconds"
+    )
+    args = parser.parse_args(argv)
+    port = args.port or readdata.Dexcom.FindDevice()
+    if not port:
+        parser.error("Could not find Dexcom Receiver!")
+    # A finite timeout lets the pipelined reader stop if the receiver hangs;
+    # see pipeline.PagePipeline.close.
+    dex = readdata.GetDevice(
+        port, G5=args.g5, G6=args.g6, pipelined=True, timeout=args.timeout
+    )
+    stream = OpenOutput(args.output, args.gzip)
+    try:
+        counts = Export(dex, args.record_types, stream, args.format)
+    finally:
+        stream.close()
+        dex.Disconnect()
+    for record_type, count in counts.items():
+        sys.stderr.write("%s: %d records\n" % (record_type, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Download many receivers at once.
+
+    results = fleet.DownloadFleet(["EGV_DATA", "METER_DATA"], max_workers=4)
+    for serial_number, result in results.items():
+        print(serial_number, result.error or len(result.records["EGV_DATA"]))
+
+Each receiver is read on its own worker thread, with at most max_workers
+receivers being downloaded at a time.
+"""
+
+import queue
+import threading
+import time
+
+from . import readdata
+
+
+class DeviceResult:
+    """Outcome of downloading one receiver."""
+
+    def __init__(self, port):
+        self.port = port
+        self.serial_number = None
+        self.records = {}
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.finished is not None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def key(self):
+        return self.serial_number or self.port
+
+    def __repr__(self):
+        state = "ok" if self.ok else (self.error or "running")
+        return "{} ({}): {}".format(self.key, self.port, state)
+
+
+def _download(port, record_types, device_class, progress, dexcom_kwargs, result):
+    result.started = time.time()
+    dex = None
+    try:
+        progress(result, "started", None)
+        dex = device_class(port, **dexcom_kwargs)
+        result.serial_number = dex.ReadManufacturingData().get("SerialNumber")
+        progress(result, "identified", result.serial_number)
+        for record_type in record_types:
+            result.records[record_type] = dex.ReadRecords(record_type)
+            progress(result, "records", record_type)
+    except Exception as e:
+        result.error = e
+        progress(result, "failed", e)
+    else:
+        progress(result, "finished", None)
+    finally:
+        result.finished = time.time()
+        if dex is not None:
+            dex.Disconnect()
+    return result
+
+
+# Serial read timeout, in seconds, unless dexcom_kwargs give one: with none,
+# a receiver that stops answering would hold its worker forever.
+SERIAL_TIMEOUT = 5
+
+
+def DownloadFleet(
+    record_types,
+    ports=None,
+    max_workers=4,
+    deadline=None,
+    device_class=readdata.Dexcom,
+    progress=None,
+    **dexcom_kwargs
+):
+    """Download record_types from every receiver concurrently.
+
+    Args:
+        record_types: list of constants.RECORD_TYPES names to read.
+        ports: tty devices to read; defaults to every attached receiver.
+        max_workers: how many receivers are downloaded at the same time.
+        deadline: seconds to wait for the whole fleet. Receivers not done
+            by then are reported with a TimeoutError; ones already being
+            read are left to finish in the background.
+        device_class: Dexcom, DexcomG5 or DexcomG6.
+        progress: optional callable(result, event, detail), called from the
+            worker threads as each receiver moves along.
+        dexcom_kwargs: passed on to device_class, with timeout (the serial
+            read timeout) defaulting to SERIAL_TIMEOUT.
+
+    Returns:
+        Dict of DeviceResult keyed by receiver serial number (or by port
+        when the serial number could not be read).
+    """
+    if ports is None:
+        ports = device_class.FindDevices()
+    dexcom_kwargs.setdefault("timeout", SERIAL_TIMEOUT)
+    lock = threading.Lock()
+
+    def report(result, event, detail):
+        if progress is not None:
+            with lock:
+                progress(result, event, detail)
+
+    results = [DeviceResult(port) for port in ports]
+    _RunWorkers(
+        results,
+        lambda result: _download(
+            result.port, record_types, device_class, report, dexcom_kwargs, result
+        ),
+        max_workers,
+        deadline,
+    )
+    for result in results:
+        if result.finished is None:
+            result.error = TimeoutError("Download did not finish in time")
+    return {result.key: result for result in results}
+
+
+def _Worker(todo, expired, download):
+    while not expired.is_set():
+        try:
+            result = todo.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            download(result)
+        except Exception as e:
+            # A failing progress callback must not strand the queue.
+            if result.error is None:
+                result.error = e
+
+
+def _RunWorkers(results, download, max_workers, deadline):
+    """Call download(result) for each of results on max_workers threads.
+
+    Returns after every result is done or deadline seconds, whichever comes
+    first; receivers not started by then are skipped.
+    """
+    todo = queue.Queue()
+    for result in results:
+        todo.put(result)
+    expired = threading.Event()
+    # Daemon threads, so a receiver that never answers cannot keep the
+    # interpreter alive after the caller has given up on it.
+    workers = [
+        threading.Thread(
+            target=_Worker,
+            args=(todo, expired, download),
+            name="dexcom-fleet",
+            daemon=True,
+        )
+        for _ in range(min(max_workers, len(results)))
+    ]
+    for thread in workers:
+        thread.start()
+    end = None if deadline is None else time.time() + deadline
+    for thread in workers:
+        thread.join(None if end is None else max(0, end - time.time()))
+    expired.set()
@@ -0,0 +1,117 @@
+import os
+import struct
+
+from . import constants, crc16, packetwriter
+
+HEADER_LEN = packetwriter.PacketWriter.OFFSET_PAYLOAD
+SOF = bytes([packetwriter.PacketWriter.SOF])
+
+
+def frame_length(header):
+    """Validate the first HEADER_LEN bytes of a frame and return its length."""
+    if header[0] != packetwriter.PacketWriter.SOF:
+        raise constants.Error("Error reading packet header!")
+    (length,) = struct.unpack_from("<H", header, 1)
+    if not (
+        packetwriter.PacketWriter.MIN_LEN <= length <= packetwriter.PacketWriter.MAX_LEN
+    ):
+        raise constants.Error("Invalid packet length %d" % length)
+    return length
+
+
+def decode_frame(frame):
+    """Check the CRC of a complete frame and return (command, payload)."""
+    crc_offset = len(frame) - 2
+    (sent_crc,) = struct.unpack_from("<H", frame, crc_offset)
+    if crc16.crc16(frame, 0, crc_offset) != sent_crc:
+        raise constants.CrcError("readpacket Failed CRC check")
+    return frame[3], bytes(frame[HEADER_LEN:crc_offset])
+
+
+class FrameReader:
+    """Reads receiver frames through one reusable buffer.
+
+    Every read drains whatever the port already has waiting, so a short
+    status reply usually arrives in a single call. Bytes past the end of the
+    current frame stay in the buffer for the next one.
+    """
+
+    def __init__(self, port, capacity=2 * packetwriter.PacketWriter.MAX_LEN):
+        self._port = port
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self._hunt_sof = False
+        self.reads = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def resync(self):
+        """Drop buffered bytes and skip to the next SOF on the next read."""
+        self.clear()
+        self._hunt_sof = True
+
+    def _skip_to_sof(self):
+        while True:
+            self._fill(1)
+            sof = self._buf.find(SOF, self._start, self._end)
+            if sof >= 0:
+                self._start = sof
+                return
+            self.clear()
+
+    def _readinto(self, view, waiting):
+        self.reads += 1
+        fileno = getattr(self._port, "fileno", None)
+        # Bytes already waiting can be taken straight off the descriptor
+        # without blocking; otherwise let the port apply its own timeout.
+        if waiting and fileno is not None and os.name == "posix":
+            try:
+                return os.readv(fileno(), [view])
+            except (BlockingIOError, OSError, ValueError):
+                pass
+        return self._port.readinto(view)
+
+    def _fill(self, size):
+        """Make sure at least size bytes are buffered past self._start."""
+        while self._end - self._start < size:
+            if len(self._buf) - self._start < size:
+                remaining = self._end - self._start
+                self._buf[:remaining] = self._view[self._start : self._end]
+                self._start, self._end = 0, remaining
+            want = size - (self._end - self._start)
+            waiting = getattr(self._port, "in_waiting", 0) or 0
+            want = min(max(want, waiting), len(self._buf) - self._end)
+            n = self._readinto(self._view[self._end : self._end + want], waiting)
+            if not n:
+                raise constants.Error("Timed out reading packet")
+            self._end += n
+
+    def read_frame(self):
+        """Return (command, payload) for the next frame on the port.
+
+        Raises constants.CrcError if the frame fails its CRC; the bad frame
+        is consumed so the next call starts at the following frame.
+        """
+        if self._hunt_sof:
+            self._hunt_sof = False
+            self._skip_to_sof()
+        self._fill(HEADER_LEN)
+        try:
+            length = frame_length(self._view[self._start : self._start + HEADER_LEN])
+        except constants.Error:
+            self.clear()
+            raise
+        self._fill(length)
+        # Filling may have moved the frame to the front of the buffer.
+        start = self._start
+        frame = self._view[start : start + length]
+        self._start = start + length
+        if self._start == self._end:
+            self.clear()
+        return decode_frame(frame)
@@ -0,0 +1,291 @@
+"""Download metrics for a Dexcom connection.
+
+    metrics = instrumentation.Metrics()
+    dex = readdata.Dexcom(port, metrics=metrics)
+    dex.ReadRecords("EGV_DATA")
+    metrics.snapshot()
+    metrics.write_prometheus("/var/lib/node_exporter/dexcom.prom")
+
+With no Metrics attached, Dexcom only pays for an "is None" test per call.
+"""
+
+import os
+import threading
+import time
+
+from . import constants
+
+# Histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Named explicitly: constants also holds masks and sizes in the command range.
+COMMAND_NAMES = {
+    getattr(constants, name): name
+    for name in (
+        "PING",
+        "READ_FIRMWARE_HEADER",
+        "READ_DATABASE_PARTITION_INFO",
+        "READ_DATABASE_PAGE_RANGE",
+        "READ_DATABASE_PAGES",
+        "READ_DATABASE_PAGE_HEADER",
+        "READ_TRANSMITTER_ID",
+        "WRITE_TRANSMITTER_ID",
+        "READ_LANGUAGE",
+        "WRITE_LANGUAGE",
+        "READ_DISPLAY_TIME_OFFSET",
+        "WRITE_DISPLAY_TIME_OFFSET",
+        "READ_RTC",
+        "RESET_RECEIVER",
+        "READ_BATTERY_LEVEL",
+        "READ_SYSTEM_TIME",
+        "READ_SYSTEM_TIME_OFFSET",
+        "WRITE_SYSTEM_TIME",
+        "READ_GLUCOSE_UNIT",
+        "WRITE_GLUCOSE_UNIT",
+        "READ_BLINDED_MODE",
+        "WRITE_BLINDED_MODE",
+        "READ_CLOCK_MODE",
+        "WRITE_CLOCK_MODE",
+        "READ_DEVICE_MODE",
+        "ERASE_DATABASE",
+        "SHUTDOWN_RECEIVER",
+        "WRITE_PC_PARAMETERS",
+        "READ_BATTERY_STATE",
+        "READ_HARDWARE_BOARD_ID",
+        "READ_FIRMWARE_SETTINGS",
+        "READ_ENABLE_SETUP_WIZARD_FLAG",
+        "READ_SETUP_WIZARD_STATE",
+        "READ_CHARGER_CURRENT_SETTING",
+        "WRITE_CHARGER_CURRENT_SETTING",
+    )
+}
+
+
+def CommandName(command_id):
+    return COMMAND_NAMES.get(command_id, str(command_id))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, cumulative count) pairs, ending with +Inf."""
+        total = 0
+        out = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+class _CommandStats:
+    def __init__(self):
+        self.count = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = Histogram()
+
+
+class _RecordTypeStats:
+    def __init__(self):
+        self.pages = 0
+        self.records = 0
+        self.read_seconds = 0.0
+        self.parse_seconds = 0.0
+
+
+class Metrics:
+    """Thread-safe counters fed by Dexcom while it talks to a receiver."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+            self._record_types = {}
+            self.crc_failures = 0
+            self.retries = {}
+
+    def command(self, command_id, latency, bytes_out, bytes_in):
+        with self._lock:
+            stats = self._commands.get(command_id)
+            if stats is None:
+                stats = self._commands[command_id] = _CommandStats()
+            stats.count += 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.latency.observe(latency)
+
+    def crc_failure(self):
+        with self._lock:
+            self.crc_failures += 1
+
+    def retry(self, record_type):
+        with self._lock:
+            self.retries[record_type] = self.retries.get(record_type, 0) + 1
+
+    def _record_type(self, record_type):
+        stats = self._record_types.get(record_type)
+        if stats is None:
+            stats = self._record_types[record_type] = _RecordTypeStats()
+        return stats
+
+    def pages_read(self, record_type, count, seconds):
+        with self._lock:
+            stats = self._record_type(record_type)
+            stats.pages += count
+            stats.read_seconds += seconds
+
+    def records_parsed(self, record_type, count, seconds):
+        with self._lock:
+            stats = self._record_type(record_type)
+            stats.records += count
+            stats.parse_seconds += seconds
+
+    def snapshot(self):
+        """Return every counter as plain dicts and numbers."""
+        with self._lock:
+            commands = {}
+            for command_id, stats in self._commands.items():
+                latency = stats.latency
+                commands[CommandName(command_id)] = dict(
+                    count=stats.count,
+                    bytes_out=stats.bytes_out,
+                    bytes_in=stats.bytes_in,
+                    latency_sum=latency.sum,
+                    latency_mean=latency.sum / latency.count if latency.count else 0,
+                    latency_buckets=latency.cumulative(),
+                )
+            record_types = {}
+            for record_type, stats in self._record_types.items():
+                busy = stats.read_seconds + stats.parse_seconds
+                record_types[record_type] = dict(
+                    pages=stats.pages,
+                    records=stats.records,
+                    read_seconds=stats.read_seconds,
+                    parse_seconds=stats.parse_seconds,
+                    pages_per_second=stats.pages / busy if busy else 0,
+                    records_per_second=stats.records / busy if busy else 0,
+                )
+            return dict(
+                commands=commands,
+                record_types=record_types,
+                crc_failures=self.crc_failures,
+                retries=dict(self.retries),
+                bytes_out=sum(c["bytes_out"] for c in commands.values()),
+                bytes_in=sum(c["bytes_in"] for c in commands.values()),
+            )
+
+    def prometheus(self, prefix="dexcom"):
+        """Render the counters in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+            for suffix, labels, value in samples:
+                label_text = ",".join('%s="%s"' % kv for kv in labels)
+                if label_text:
+                    label_text = "{%s}" % label_text
+                lines.append("%s_%s%s%s %r" % (prefix, name, suffix, label_text, value))
+
+        commands = sorted(snap["commands"].items())
+        metric(
+            "commands_total",
+            "counter",
+            "Commands sent to the receiver.",
+            [("", [("command", n)], c["count"]) for n, c in commands],
+        )
+        latency = []
+        for n, c in commands:
+            for bound, count in c["latency_buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                latency.append(("_bucket", [("command", n), ("le", le)], count))
+            latency.append(("_sum", [("command", n)], c["latency_sum"]))
+            latency.append(("_count", [("command", n)], c["count"]))
+        metric(
+            "command_latency_seconds",
+            "histogram",
+            "Time from sending a command to its verified response.",
+            latency,
+        )
+        for direction in ("out", "in"):
+            metric(
+                "bytes_%s_total" % direction,
+                "counter",
+                "Bytes %s the serial port."
+                % ("written to" if direction == "out" else "read from"),
+                [("", [("command", n)], c["bytes_" + direction]) for n, c in commands],
+            )
+        metric(
+            "crc_failures_total",
+            "counter",
+            "Responses that failed their CRC check.",
+            [("", [], snap["crc_failures"])],
+        )
+        metric(
+            "page_retries_total",
+            "counter",
+            "Page reads that were retried.",
+            [("", [("record_type", t)], n) for t, n in sorted(snap["retries"].items())],
+        )
+        record_types = sorted(snap["record_types"].items())
+        for key, kind, help_text in (
+            ("pages", "counter", "Database pages downloaded."),
+            ("records", "counter", "Records parsed."),
+            ("read_seconds", "counter", "Seconds spent reading pages."),
+            ("parse_seconds", "counter", "Seconds spent parsing records."),
+            ("pages_per_second", "gauge", "Pages per busy second."),
+            ("records_per_second", "gauge", "Records per busy second."),
+        ):
+            name = key if key.endswith("second") else key + "_total"
+            metric(
+                name,
+                kind,
+                help_text,
+                [("", [("record_type", t)], s[key]) for t, s in record_types],
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="dexcom"):
+        """Atomically write prometheus() to path, for a textfile collector."""
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "w") as f:
+            f.write(self.prometheus(prefix))
+        os.replace(tmp, path)
+
+
+def CountRecords(metrics, record_type, records):
+    """Yield records, charging their count and parse time to metrics."""
+    count = 0
+    seconds = 0.0
+    it = iter(records)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                record = next(it)
+            except StopIteration:
+                return
+            seconds += time.perf_counter() - started
+            count += 1
+            yield record
+    finally:
+        metrics.records_parsed(record_type, count, seconds)
@@ -20,32 +20,33 @@ class PacketWriter:
         self._packet = None
 
     def NewSOF(self, v):
-        self._packet[0] = chr(v)
+        self._packet[self.OFFSET_SOF] = v
 
     def PacketString(self):
-        return "".join(self._packet)
+        return bytes(self._packet)
 
     def AppendCrc(self):
         self.SetLength()
-        ps = self.PacketString()
-        crc = crc16.crc16(ps, 0, len(ps))
-        for x in struct.pack("H", crc):
-            self._packet.append(x)
+        crc = crc16.crc16(self._packet)
+        self._packet += struct.pack("<H", crc)
 
     def SetLength(self):
-        self._packet[1] = chr(len(self._packet) + 2)
+        struct.pack_into("<H", self._packet, self.OFFSET_LENGTH, len(self._packet) + 2)
 
     def _Add(self, x):
-        try:
-            len(x)
+        if isinstance(x, int):
+            self._packet.append(x)
+        elif isinstance(x, (bytes, bytearray, memoryview)):
+            self._packet += x
+        elif isinstance(x, str):
+            self._packet += x.encode("latin-1")
+        else:
             for y in x:
                 self._Add(y)
-        except:  # noqa: E722
-            self._packet.append(x)
 
     def ComposePacket(self, command, payload=None):
         assert self._packet is None
-        self._packet = ["\x01", None, "\x00", chr(command)]
-        if payload:
+        self._packet = bytearray((self.SOF, 0, 0, command))
+        if payload is not None:
             self._Add(payload)
         self.AppendCrc()
@@ -0,0 +1,197 @@
+"""Persistent cache of receiver database pages.
+
+    cache = pagecache.PageCache("~/.cache/dexcom-pages")
+    dex = readdata.Dexcom(port, page_cache=cache)
+    dex.ReadRecords("EGV_DATA")   # historic pages now come from disk
+
+    offline = pagecache.OfflineReceiver(cache, "SM12345678")
+    offline.ReadRecords("EGV_DATA")
+
+Every page but the newest in a record type's range is full and never changes
+again, so Dexcom stores those in the cache as they are downloaded and only
+asks the receiver for pages it has not seen and for the newest page. A page
+is stored as its raw header and record payload under
+<directory>/<serial>/<record type>/<page>-<header crc>.page. The header CRC
+is checked again when the page is loaded. The least recently used pages are
+evicted once the cache grows past max_bytes.
+"""
+
+import collections
+import os
+import threading
+
+from . import constants, crc16, database_records, readdata
+
+# Single-page XML records identify the receiver and are always read from it.
+UNCACHED_RECORD_TYPES = ("MANUFACTURING_DATA", "PC_SOFTWARE_PARAMETER")
+
+
+class PageCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (serial, record type, page) -> (path, size), least recently used first.
+        self._index = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._Scan()
+
+    def _Scan(self):
+        entries = []
+        if os.path.isdir(self.directory):
+            for serial in os.listdir(self.directory):
+                for record_type in os.listdir(os.path.join(self.directory, serial)):
+                    folder = os.path.join(self.directory, serial, record_type)
+                    for name in os.listdir(folder):
+                        if not name.endswith(".page"):
+                            continue
+                        path = os.path.join(folder, name)
+                        page = int(name.split("-")[0])
+                        st = os.stat(path)
+                        entries.append(
+                            (st.st_mtime, (serial, record_type, page), path, st.st_size)
+                        )
+        for _, key, path, size in sorted(entries):
+            self._index[key] = (path, size)
+            self.size += size
+        self._Evict()
+
+    def _Path(self, serial, record_type, header):
+        return os.path.join(
+            self.directory,
+            serial,
+            record_type,
+            "%d-%04x.page" % (header[4], header[-1]),
+        )
+
+    def Get(self, serial, record_type, page):
+        """Return the cached (header, data) for page, or None."""
+        with self._lock:
+            entry = self._index.get((serial, record_type, page))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end((serial, record_type, page))
+        path = entry[0]
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            pages = readdata.Dexcom.SplitPages(
+                raw, constants.RECORD_TYPES.index(record_type), page, 1
+            )
+        except (OSError, constants.Error):
+            self.Discard(serial, record_type, page)
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+        return pages[0]
+
+    def Put(self, serial, record_type, header, data):
+        """Store a page downloaded from the receiver."""
+        page_header = database_records.PAGE_HEADER
+        raw = page_header.pack(*header) + bytes(data)
+        if crc16.crc16(raw, 0, page_header.size - 2) != header[-1]:
+            raise constants.CrcError("Page %d header failed CRC" % header[4])
+        path = self._Path(serial, record_type, header)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        key = (serial, record_type, header[4])
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+                if old[0] != path:
+                    _unlink(old[0])
+            self._index[key] = (path, len(raw))
+            self.size += len(raw)
+            self._Evict()
+
+    def _Evict(self):
+        while self.size > self.max_bytes and self._index:
+            _, (path, size) = self._index.popitem(last=False)
+            self.size -= size
+            _unlink(path)
+
+    def Discard(self, serial, record_type, page):
+        with self._lock:
+            entry = self._index.pop((serial, record_type, page), None)
+            if entry is not None:
+                self.size -= entry[1]
+                _unlink(entry[0])
+
+    def DiscardFrom(self, serial, record_type, page):
+        """Drop cached pages numbered page or later, e.g. after an erase."""
+        for key in self.Pages(serial, record_type):
+            if key >= page:
+                self.Discard(serial, record_type, key)
+
+    def Pages(self, serial, record_type):
+        """Sorted page numbers cached for serial and record_type."""
+        with self._lock:
+            return sorted(
+                key[2]
+                for key in self._index
+                if key[0] == serial and key[1] == record_type
+            )
+
+    def Serials(self):
+        with self._lock:
+            return sorted({key[0] for key in self._index})
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class OfflineReceiver:
+    """Parse the pages of one receiver held in a PageCache, without a device.
+
+    Only the full pages that were cached are available; the newest page of
+    each range is never cached, so its records are missing here. device_class
+    (default readdata.Dexcom) selects the record parsers.
+    """
+
+    def __init__(self, cache, serial_number, device_class=None):
+        self.cache = cache
+        self.serial_number = serial_number
+        if device_class is None:
+            device_class = readdata.Dexcom
+        # Used only for its record parsers, never opened.
+        self.parser = device_class(None)
+
+    def PageNumbers(self, record_type):
+        return self.cache.Pages(self.serial_number, record_type)
+
+    def iter_raw_pages(self, record_type, pages=None, reverse=False):
+        if pages is None:
+            pages = self.PageNumbers(record_type)
+        for page in reversed(pages) if reverse else pages:
+            cached = self.cache.Get(self.serial_number, record_type, page)
+            if cached is not None:
+                yield cached
+
+    def iter_records(self, record_type, since=None, limit=None):
+        """Yield records newest first; see Dexcom.iter_records."""
+        records = (
+            record
+            for header, data in self.iter_raw_pages(record_type, reverse=True)
+            for record in self.parser.ParsePage(header, data, reverse=True)
+        )
+        yield from readdata.TakeRecords(records, since, limit)
+
+    def ReadRecords(self, record_type):
+        records = []
+        for header, data in self.iter_raw_pages(record_type):
+            records.extend(self.parser.ParsePage(header, data))
+        return records
@@ -0,0 +1,93 @@
+"""Parse raw database pages on a pool of worker processes.
+
+    pages = dex.iter_raw_pages("SENSOR_DATA", dex.PageNumbers("SENSOR_DATA"))
+    for record in parallel.ParsePages(pages, readdata.DexcomG5):
+        ...
+
+Pages can come from anywhere that yields (header, data) pairs: a receiver,
+a pagecache.OfflineReceiver or an archive. They are sent to the workers in
+batches of batch_pages; each worker decodes them, checks CRCs and converts
+every record with to_dict(), then returns the whole batch as one block of
+newline-delimited JSON, so the parent unpickles one string per batch rather
+than one object per record. Batches come back in submission order.
+"""
+
+import concurrent.futures
+import json
+import os
+
+from . import constants, readdata, util
+
+_parser = None
+
+
+def _InitWorker(device_class, crc_mode):
+    global _parser
+    _parser = device_class(None, crc_mode=crc_mode)
+
+
+def _ParseBatch(batch):
+    lines = []
+    for header, data in batch:
+        for record in _parser.ParsePage(header, data):
+            lines.append(json.dumps(record.to_dict(), default=util.JsonDefault))
+    if not lines:
+        return b""
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+def _Batches(pages, batch_pages):
+    batch = []
+    for header, data in pages:
+        batch.append((tuple(header), bytes(data)))
+        if len(batch) >= batch_pages:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ParsePagesNDJSON(
+    pages,
+    device_class=readdata.Dexcom,
+    crc_mode=constants.CRC_STRICT,
+    max_workers=None,
+    batch_pages=32,
+):
+    """Yield one bytes block of NDJSON records per batch of pages, in order.
+
+    device_class picks the record parsers. At most two batches per worker
+    are in flight, so pages are read from the iterable only as fast as the
+    workers keep up. A CrcError (or any other error) raised in a worker is
+    re-raised here.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    window = 2 * max_workers
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers,
+        initializer=_InitWorker,
+        initargs=(device_class, crc_mode),
+    ) as pool:
+        pending = []
+        try:
+            for batch in _Batches(pages, batch_pages):
+                pending.append(pool.submit(_ParseBatch, batch))
+                if len(pending) >= window:
+                    yield pending.pop(0).result()
+            while pending:
+                yield pending.pop(0).result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def ParsePages(pages, device_class=readdata.Dexcom, **kwargs):
+    """Yield each record of pages as a to_dict() dict, in page order.
+
+    Takes the same arguments as ParsePagesNDJSON.
+    """
+    for block in ParsePagesNDJSON(pages, device_class, **kwargs):
+        for line in block.splitlines():
+            yield json.loads(line)
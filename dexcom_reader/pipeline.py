@@ -0,0 +1,84 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class PagePipeline:
+    """Fetch raw database pages on a background thread.
+
+    The reader thread walks Dexcom.iter_raw_pages and pushes (header, data)
+    pairs onto a bounded queue, so the serial round trip for the next pages
+    overlaps with whatever the consumer does with the current one. Iterating
+    the pipeline yields the pairs in the same order iter_raw_pages would.
+    Errors raised by the reader are re-raised in the consumer.
+    """
+
+    def __init__(self, dex, record_type, pages, reverse=False, depth=8):
+        self._dex = dex
+        self._record_type = record_type
+        self._pages = pages
+        self._reverse = reverse
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            for item in self._dex.iter_raw_pages(
+                self._record_type, self._pages, reverse=self._reverse
+            ):
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._put((_DONE, e))
+            return
+        self._put((_DONE, None))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="dexcom-page-reader", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    # Seconds close() waits for the reader thread to finish.
+    CLOSE_TIMEOUT = 5.0
+
+    def close(self):
+        """Stop the reader and wait up to CLOSE_TIMEOUT for it to finish.
+
+        A reader stuck in a read on a silent receiver cannot be interrupted:
+        close() then returns with the thread still running, and the port
+        stays in use by it until that read returns. Give the Dexcom a finite
+        timeout when pipelining so the read always does. Returns True once
+        the reader has finished.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.CLOSE_TIMEOUT)
+            return not self._thread.is_alive()
+        return True
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item[0] is _DONE:
+                    if item[1] is not None:
+                        raise item[1]
+                    return
+                yield item
+        finally:
+            self.close()
@@ -0,0 +1,63 @@
+"""Plan page downloads from page headers before fetching whole pages.
+
+READ_DATABASE_PAGE_HEADER returns just the 28 byte header of a page, whose
+record count says whether the page has grown since it was last read. These
+helpers spend one such request to avoid downloading pages that hold nothing
+new, or to confirm that cached pages still match the receiver.
+"""
+
+import collections
+
+DownloadPlan = collections.namedtuple("DownloadPlan", "pages skip newer_than")
+DownloadPlan.__doc__ = """Pages to fetch for an incremental download.
+
+pages is the range of page numbers to read, skip the number of records at
+the start of the first page that were already delivered, and newer_than a
+receiver system time records must be newer than, or None.
+"""
+
+
+def PlanSync(dex, record_type, mark):
+    """Plan fetching the records of record_type newer than mark.
+
+    mark is a sync.SyncState mark (page, records, system_time) or None. When
+    the marked page is still on the receiver its header is read first: if
+    it holds no more records than were delivered from it, the page is not
+    downloaded again.
+    """
+    pages = dex.PageNumbers(record_type)
+    if not pages or mark is None or mark["page"] >= pages.stop:
+        # Nothing synced yet, or the database was erased since.
+        return DownloadPlan(pages, 0, None)
+    if mark["page"] < pages.start:
+        # The marked page fell out of the receiver's ring buffer.
+        return DownloadPlan(pages, 0, mark["system_time"])
+    first, skip = mark["page"], mark["records"]
+    header = dex.ReadDatabasePageHeader(record_type, first)
+    if header.record_count < skip:
+        # Fewer records than already delivered: the page was rewritten.
+        return DownloadPlan(pages, 0, mark["system_time"])
+    if header.record_count == skip:
+        first, skip = first + 1, 0
+    return DownloadPlan(range(first, pages.stop), skip, None)
+
+
+def CheckCache(dex, serial, record_type, cache, newest):
+    """Drop cached pages of record_type that no longer match the receiver.
+
+    The newest full page in cache is compared, by header, with the one on
+    the receiver. A mismatch means the database was erased and refilled, so
+    every cached page of that type is discarded. Headers hold record indexes
+    and counts but no timestamps, so a database refilled to exactly the same
+    shape goes unnoticed. Returns True if the cache was kept.
+    """
+    full = [page for page in cache.Pages(serial, record_type) if page < newest]
+    if not full:
+        return True
+    cached = cache.Get(serial, record_type, full[-1])
+    if cached is None:
+        return True
+    if tuple(dex.ReadDatabasePageHeader(record_type, full[-1])) == tuple(cached[0]):
+        return True
+    cache.DiscardFrom(serial, record_type, 0)
+    return False
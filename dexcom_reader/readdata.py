@@ -1,11 +1,28 @@
+import collections
 import datetime
 import struct
 import sys
+import time
 from xml.etree import ElementTree as ET
 
 import serial
 
-from . import constants, crc16, database_records, packetwriter, util
+from . import (
+    constants,
+    crc16,
+    database_records,
+    framereader,
+    instrumentation,
+    packetwriter,
+    pagecache,
+    pipeline,
+    planner,
+    recordbatch,
+    responsecache,
+    util,
+)
+
+SOF = bytes([packetwriter.PacketWriter.SOF])
 
 
 class ReadPacket:
@@ -29,6 +46,12 @@ class Dexcom:
             constants.DEXCOM_USB_VENDOR, constants.DEXCOM_USB_PRODUCT
         )
 
+    @staticmethod
+    def FindDevices():
+        return util.find_all_usbserial(
+            constants.DEXCOM_USB_VENDOR, constants.DEXCOM_USB_PRODUCT
+        )
+
     @classmethod
     def LocateAndDownload(cls):
         device = cls.FindDevice()
@@ -36,7 +59,7 @@ class Dexcom:
             sys.stderr.write("Could not find Dexcom Receiver!\n")
             sys.exit(1)
         else:
-            dex = cls(device)
+            dex = cls(device, cache=responsecache.ResponseCache())
             print(
                 "Found %s S/N: %s"
                 % (
@@ -51,25 +74,77 @@ class Dexcom:
             )
             print("Record count:")
             print("- Meter records: %d" % (len(dex.ReadRecords("METER_DATA"))))
-            print("- CGM records: %d" % (len(dex.ReadRecords("EGV_DATA"))))
+            egv_records = dex.ReadRecords("EGV_DATA")
+            print("- CGM records: %d" % (len(egv_records)))
             print(
                 "- CGM commitable records: %d"
-                % (len([not x.display_only for x in dex.ReadRecords("EGV_DATA")]))
+                % (len([x for x in egv_records if not x.display_only]))
             )
             print("- Event records: %d" % (len(dex.ReadRecords("USER_EVENT_DATA"))))
             print("- Insertion records: %d" % (len(dex.ReadRecords("INSERTION_TIME"))))
 
-    def __init__(self, port):
+    # Retried page reads kept in retried_pages; older ones are dropped, so a
+    # long-running connection (the daemon's) does not grow without bound.
+    RETRY_HISTORY = 100
+
+    def __init__(
+        self,
+        port,
+        crc_mode=constants.CRC_STRICT,
+        buffered=False,
+        pipelined=False,
+        metrics=None,
+        timeout=None,
+        retries=0,
+        retry_backoff=0.1,
+        cache=None,
+        page_cache=None,
+    ):
+        if crc_mode not in constants.CRC_MODES:
+            raise constants.Error("Unknown CRC mode %r" % crc_mode)
         self._port_name = port
         self._port = None
+        self.crc_mode = crc_mode
+        self.buffered = buffered
+        self.pipelined = pipelined
+        self._frame_reader = None
+        # An instrumentation.Metrics to feed, or None to skip the bookkeeping.
+        self.metrics = metrics
+        self._pending_command = None
+        # Serial read timeout in seconds; None blocks forever, and then a
+        # pipelined reader cannot stop while the receiver is silent (see
+        # pipeline.PagePipeline.close).
+        self.timeout = timeout
+        # How often a failed page read is retried, with exponential backoff
+        # starting at retry_backoff seconds. The last RETRY_HISTORY retried
+        # reads are logged in retried_pages.
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retried_pages = collections.deque(maxlen=self.RETRY_HISTORY)
+        self._hunt_sof = False
+        # A responsecache.ResponseCache for status reads, firmware and
+        # manufacturing XML and page ranges; None always asks the receiver.
+        self.cache = cache
+        # A pagecache.PageCache keeping full database pages on disk; None
+        # downloads every page.
+        self.page_cache = page_cache
+        self._serial_number = None
+        # (serial, record type) -> newest page the page cache was checked at.
+        self._cache_newest = {}
 
     def Connect(self):
         if self._port is None:
-            self._port = serial.Serial(port=self._port_name, baudrate=115200)
+            self._port = serial.Serial(
+                port=self._port_name, baudrate=115200, timeout=self.timeout
+            )
 
     def Disconnect(self):
         if self._port is not None:
             self._port.close()
+        if self.cache is not None:
+            self.cache.Clear()
+        self._serial_number = None
+        self._cache_newest.clear()
 
     @property
     def port(self):
@@ -83,24 +158,54 @@ class Dexcom:
     def read(self, *args, **kwargs):
         return self.port.read(*args, **kwargs)
 
+    @property
+    def frame_reader(self):
+        if self._frame_reader is None:
+            self._frame_reader = framereader.FrameReader(self.port)
+        return self._frame_reader
+
     def readpacket(self, timeout=None):
-        total_read = 4
-        initial_read = self.read(total_read)
-        all_data = initial_read
-        if ord(initial_read[0]) == 1:
+        if self.metrics is None:
+            return self._readpacket(timeout)
+        pending, self._pending_command = self._pending_command, None
+        try:
+            packet = self._readpacket(timeout)
+        except constants.CrcError:
+            self.metrics.crc_failure()
+            raise
+        if pending is not None:
+            command_id, started, bytes_out = pending
+            latency = time.perf_counter() - started
+            bytes_in = len(packet.data) + packetwriter.PacketWriter.MIN_LEN
+            self.metrics.command(command_id, latency, bytes_out, bytes_in)
+        return packet
+
+    def _readpacket(self, timeout=None):
+        if self.buffered:
+            return ReadPacket(*self.frame_reader.read_frame())
+        initial_read = self.read(4)
+        if self._hunt_sof:
+            self._hunt_sof = False
+            initial_read = self._SkipToSOF(initial_read)
+        if len(initial_read) < 4:
+            raise constants.Error("Timed out reading packet header")
+        if initial_read[:1] == SOF:
+            crc = crc16.Crc16(initial_read)
             command = initial_read[3]
             data_number = struct.unpack("<H", initial_read[1:3])[0]
+            toread = 0
             if data_number > 6:
                 toread = abs(data_number - 6)
                 second_read = self.read(toread)
-                all_data += second_read
-                total_read += toread
+                crc.update(second_read)
                 out = second_read
             else:
-                out = ""
+                out = b""
             suffix = self.read(2)
+            if len(out) < toread or len(suffix) < 2:
+                raise constants.Error("Timed out reading packet")
             sent_crc = struct.unpack("<H", suffix)[0]
-            local_crc = crc16.crc16(all_data, 0, total_read)
+            local_crc = crc.digest()
             if sent_crc != local_crc:
                 raise constants.CrcError("readpacket Failed CRC check")
             # num1 = total_read + 2
@@ -108,10 +213,28 @@ class Dexcom:
         else:
             raise constants.Error("Error reading packet header!")
 
+    def _SkipToSOF(self, data):
+        for _ in range(packetwriter.PacketWriter.MAX_LEN):
+            if data[:1] == SOF or len(data) < 4:
+                break
+            data = data[1:] + self.read(1)
+        return data
+
+    def resync(self):
+        """Drop what is left of a bad exchange before the next command.
+
+        Clears both directions of the port and any buffered frame bytes, and
+        makes the next read skip ahead to a start-of-frame byte.
+        """
+        self.clear()
+        self._hunt_sof = True
+        if self._frame_reader is not None:
+            self._frame_reader.resync()
+
     def Ping(self):
         self.WriteCommand(constants.PING)
         packet = self.readpacket()
-        return ord(packet.command) == constants.ACK
+        return packet.command == constants.ACK
 
     def WritePacket(self, packet):
         if not packet:
@@ -125,11 +248,30 @@ class Dexcom:
     def WriteCommand(self, command_id, *args, **kwargs):
         p = packetwriter.PacketWriter()
         p.ComposePacket(command_id, *args, **kwargs)
-        self.WritePacket(p.PacketString())
+        packet = p.PacketString()
+        if self.cache is not None:
+            self.cache.Invalidate(command_id)
+        if self.metrics is not None:
+            self._pending_command = (command_id, time.perf_counter(), len(packet))
+        self.WritePacket(packet)
 
     def GenericReadCommand(self, command_id):
-        self.WriteCommand(command_id)
-        return self.readpacket()
+        def read():
+            self.WriteCommand(command_id)
+            return self.readpacket()
+
+        return self._Cached(command_id, command_id, read)
+
+    def _Cached(self, key, rule, compute):
+        if self.cache is None:
+            return compute()
+        return self.cache.Lookup(key, rule, compute)
+
+    def _CachedXML(self, command_id):
+        def parse():
+            return ET.fromstring(self.GenericReadCommand(command_id).data)
+
+        return self._Cached(("xml", command_id), command_id, parse)
 
     def ReadTransmitterId(self):
         return self.GenericReadCommand(constants.READ_TRANSMITTER_ID).data
@@ -144,7 +286,7 @@ class Dexcom:
 
     def ReadBatteryState(self):
         state = self.GenericReadCommand(constants.READ_BATTERY_STATE).data
-        return constants.BATTERY_STATES[ord(state)]
+        return constants.BATTERY_STATES[state[0]]
 
     def ReadRTC(self):
         rtc = self.GenericReadCommand(constants.READ_RTC).data
@@ -166,7 +308,7 @@ class Dexcom:
         payload = struct.pack("i", offset)
         self.WriteCommand(constants.WRITE_DISPLAY_TIME_OFFSET, payload)
         packet = self.readpacket()
-        return dict(ACK=ord(packet.command) == constants.ACK)
+        return dict(ACK=packet.command == constants.ACK)
 
     def ReadDisplayTime(self):
         return self.ReadSystemTime() + self.ReadDisplayTimeOffset()
@@ -174,12 +316,12 @@ class Dexcom:
     def ReadGlucoseUnit(self):
         UNIT_TYPE = (None, "mg/dL", "mmol/L")
         gu = self.GenericReadCommand(constants.READ_GLUCOSE_UNIT).data
-        return UNIT_TYPE[ord(gu[0])]
+        return UNIT_TYPE[gu[0]]
 
     def ReadClockMode(self):
         CLOCK_MODE = (24, 12)
         cm = self.GenericReadCommand(constants.READ_CLOCK_MODE).data
-        return CLOCK_MODE[ord(cm[0])]
+        return CLOCK_MODE[cm[0]]
 
     def ReadDeviceMode(self):
         # ???
@@ -204,11 +346,11 @@ class Dexcom:
 
     def WriteChargerCurrentSetting(self, status):
         MAP = ("Off", "Power100mA", "Power500mA", "PowerMax", "PowerSuspended")
-        payload = str(bytearray([MAP.index(status)]))
+        payload = bytes([MAP.index(status)])
         self.WriteCommand(constants.WRITE_CHARGER_CURRENT_SETTING, payload)
         packet = self.readpacket()
         raw = bytearray(packet.data)
-        return dict(ACK=ord(packet.command) == constants.ACK, raw=list(raw))
+        return dict(ACK=packet.command == constants.ACK, raw=list(raw))
 
     def ReadChargerCurrentSetting(self):
         MAP = ("Off", "Power100mA", "Power500mA", "PowerMax", "PowerSuspended")
@@ -218,8 +360,16 @@ class Dexcom:
         return MAP[raw[0]]
 
     def ReadManufacturingData(self):
-        data = self.ReadRecords("MANUFACTURING_DATA")[0].xmldata
-        return ET.fromstring(data)
+        def parse():
+            data = self.ReadRecords("MANUFACTURING_DATA")[0].xmldata
+            return ET.fromstring(data)
+
+        return self._Cached(("xml", "MANUFACTURING_DATA"), "MANUFACTURING_DATA", parse)
+
+    def ReadSerialNumber(self):
+        if self._serial_number is None:
+            self._serial_number = self.ReadManufacturingData().get("SerialNumber")
+        return self._serial_number
 
     def flush(self):
         self.port.flush()
@@ -227,49 +377,266 @@ class Dexcom:
     def clear(self):
         self.port.flushInput()
         self.port.flushOutput()
+        if self._frame_reader is not None:
+            self._frame_reader.clear()
 
     def GetFirmwareHeader(self):
-        i = self.GenericReadCommand(constants.READ_FIRMWARE_HEADER)
-        return ET.fromstring(i.data)
+        return self._CachedXML(constants.READ_FIRMWARE_HEADER)
 
     def GetFirmwareSettings(self):
-        i = self.GenericReadCommand(constants.READ_FIRMWARE_SETTINGS)
-        return ET.fromstring(i.data)
+        return self._CachedXML(constants.READ_FIRMWARE_SETTINGS)
 
     def DataPartitions(self):
-        i = self.GenericReadCommand(constants.READ_DATABASE_PARTITION_INFO)
-        return ET.fromstring(i.data)
+        return self._CachedXML(constants.READ_DATABASE_PARTITION_INFO)
 
     def ReadDatabasePageRange(self, record_type):
         record_type_index = constants.RECORD_TYPES.index(record_type)
-        self.WriteCommand(constants.READ_DATABASE_PAGE_RANGE, chr(record_type_index))
-        packet = self.readpacket()
-        return struct.unpack("II", packet.data)
 
-    def ReadDatabasePage(self, record_type, page):
+        def read():
+            self.WriteCommand(constants.READ_DATABASE_PAGE_RANGE, record_type_index)
+            packet = self.readpacket()
+            return struct.unpack("II", packet.data)
+
+        key = (constants.READ_DATABASE_PAGE_RANGE, record_type_index)
+        return self._Cached(key, constants.READ_DATABASE_PAGE_RANGE, read)
+
+    # The receiver stores fixed-size pages; this many fit in one response.
+    PAGES_PER_REQUEST = (
+        packetwriter.PacketWriter.MAX_PAYLOAD // constants.DATABASE_PAGE_SIZE
+    )
+
+    def ReadDatabasePages(self, record_type, page, count=1):
+        """Fetch count consecutive pages starting at page in one command.
+
+        Returns a list of (header, data) pairs, one per page, where data is a
+        memoryview of the page's record payload.
+        """
+        if self.metrics is not None:
+            started = time.perf_counter()
         record_type_index = constants.RECORD_TYPES.index(record_type)
         self.WriteCommand(
             constants.READ_DATABASE_PAGES,
-            (chr(record_type_index), struct.pack("I", page), chr(1)),
+            (record_type_index, struct.pack("<I", page), count),
+        )
+        packet = self.readpacket()
+        if packet.command != constants.ACK:
+            raise constants.Error(
+                "READ_DATABASE_PAGES answered with %d" % packet.command
+            )
+        pages = self.SplitPages(packet.data, record_type_index, page, count)
+        if self.metrics is not None:
+            elapsed = time.perf_counter() - started
+            self.metrics.pages_read(record_type, count, elapsed)
+        return pages
+
+    @staticmethod
+    def SplitPages(payload, record_type_index, page, count):
+        """Split a READ_DATABASE_PAGES response into (header, data) pairs."""
+        if not payload or len(payload) % count:
+            raise constants.Error("Cannot split %d bytes into pages" % len(payload))
+        page_size = len(payload) // count
+        header_size = database_records.PAGE_HEADER.size
+        view = memoryview(payload)
+        pages = []
+        for i, offset in enumerate(range(0, len(view), page_size)):
+            header = Dexcom.ParsePageHeader(view, record_type_index, page + i, offset)
+            data = view[offset + header_size : offset + page_size]
+            pages.append((header, data))
+        return pages
+
+    @staticmethod
+    def ParsePageHeader(buf, record_type_index, page, offset=0):
+        """Unpack and check the page header at offset in buf."""
+        page_header = database_records.PAGE_HEADER
+        if len(buf) < offset + page_header.size:
+            raise constants.Error("Short page header for page %d" % page)
+        header = database_records.PageHeader._make(page_header.unpack_from(buf, offset))
+        if crc16.crc16(buf, offset, offset + page_header.size - 2) != header.crc:
+            raise constants.CrcError("Page %d header failed CRC" % page)
+        if header.record_type != record_type_index or header.page_number != page:
+            raise constants.Error(
+                "Expected page %d of type %d, got page %d of type %d"
+                % (page, record_type_index, header.page_number, header.record_type)
+            )
+        return header
+
+    def ReadDatabasePageHeader(self, record_type, page):
+        """Fetch only the header of a page, without its records.
+
+        Returns a database_records.PageHeader; record_count tells how many
+        records the page holds, at a fraction of the cost of reading it.
+        """
+        record_type_index = constants.RECORD_TYPES.index(record_type)
+        self.WriteCommand(
+            constants.READ_DATABASE_PAGE_HEADER,
+            (record_type_index, struct.pack("<I", page)),
         )
         packet = self.readpacket()
-        assert ord(packet.command) == 1
-        # first index (uint), numrec (uint), record_type (byte), revision (byte),
-        # page# (uint), r1 (uint), r2 (uint), r3 (uint), ushort (Crc)
-        header_format = "<2IcB4IH"
-        header_data_len = struct.calcsize(header_format)
-        header = struct.unpack_from(header_format, packet.data)
-        header_crc = crc16.crc16(packet.data[: header_data_len - 2])
-        assert header_crc == header[-1]
-        assert ord(header[2]) == record_type_index
-        assert header[4] == page
-        packet_data = packet.data[header_data_len:]
-
-        return self.ParsePage(header, packet_data)
-
-    def GenericRecordYielder(self, header, data, record_type):
-        for x in range(header[1]):
-            yield record_type.Create(data, x)
+        if packet.command != constants.ACK:
+            raise constants.Error(
+                "READ_DATABASE_PAGE_HEADER answered with %d" % packet.command
+            )
+        return self.ParsePageHeader(packet.data, record_type_index, page)
+
+    def ReadDatabasePage(self, record_type, page):
+        if self.page_cache is not None:
+            pages = range(page, page + 1)
+            header, data = next(iter(self.iter_raw_pages(record_type, pages)))
+        else:
+            header, data = self.ReadDatabasePages(record_type, page)[0]
+        return self.ParsePage(header, data)
+
+    @staticmethod
+    def PagesInRange(page_range):
+        start, end = page_range
+        if start != end or not end:
+            end += 1
+        return range(start, end)
+
+    def PageNumbers(self, record_type):
+        assert record_type in constants.RECORD_TYPES
+        return self.PagesInRange(self.ReadDatabasePageRange(record_type))
+
+    def PageBatches(self, pages, reverse=False):
+        """Split the range pages into (first, count) requests."""
+        step = max(1, self.PAGES_PER_REQUEST)
+        if reverse:
+            for stop in range(pages.stop, pages.start, -step):
+                first = max(pages.start, stop - step)
+                yield first, stop - first
+        else:
+            for first in range(pages.start, pages.stop, step):
+                yield first, min(step, pages.stop - first)
+
+    def iter_raw_pages(self, record_type, pages, reverse=False):
+        """Yield (header, data) for each page in the range pages.
+
+        Consecutive pages are fetched PAGES_PER_REQUEST at a time. With
+        reverse=True the pages come newest first. With a page_cache, full
+        pages are served from and saved to it.
+        """
+        if (
+            self.page_cache is not None
+            and record_type not in pagecache.UNCACHED_RECORD_TYPES
+        ):
+            yield from self._iter_cached_pages(record_type, pages, reverse)
+            return
+        for first, count in self.PageBatches(pages, reverse):
+            batch = self.ReadDatabasePagesWithRetries(record_type, first, count)
+            yield from reversed(batch) if reverse else batch
+
+    def _CheckedNewestPage(self, serial, record_type, pages):
+        """The newest page of record_type, with the page cache checked.
+
+        The page range is read, and the cache checked against the receiver,
+        once per record type per session, and again only when pages reach
+        the newest page seen so far (which is never served from the cache).
+        """
+        key = (serial, record_type)
+        checked = self._cache_newest.get(key)
+        if checked is not None and (not pages or pages[-1] < checked):
+            return checked
+        newest = self.ReadDatabasePageRange(record_type)[1]
+        if newest != checked:
+            # Pages past the newest one were erased from the receiver.
+            self.page_cache.DiscardFrom(serial, record_type, newest + 1)
+            planner.CheckCache(self, serial, record_type, self.page_cache, newest)
+            self._cache_newest[key] = newest
+        return newest
+
+    def _iter_cached_pages(self, record_type, pages, reverse):
+        serial = self.ReadSerialNumber()
+        newest = self._CheckedNewestPage(serial, record_type, pages)
+
+        def fetch(missing):
+            run = range(min(missing), max(missing) + 1)
+            for first, count in self.PageBatches(run, reverse):
+                batch = self.ReadDatabasePagesWithRetries(record_type, first, count)
+                for header, data in reversed(batch) if reverse else batch:
+                    if header[4] < newest:
+                        self.page_cache.Put(serial, record_type, header, data)
+                    yield header, data
+
+        missing = []
+        for page in reversed(pages) if reverse else pages:
+            cached = None
+            if page < newest:
+                cached = self.page_cache.Get(serial, record_type, page)
+            if cached is None:
+                missing.append(page)
+                continue
+            if missing:
+                yield from fetch(missing)
+                missing = []
+            yield cached
+        if missing:
+            yield from fetch(missing)
+
+    def ReadDatabasePagesWithRetries(self, record_type, page, count=1):
+        """ReadDatabasePages, retried up to self.retries times on error.
+
+        Between attempts the link is resynced and the call sleeps with
+        exponential backoff. Each retry is appended to self.retried_pages,
+        which keeps the last RETRY_HISTORY of them.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.ReadDatabasePages(record_type, page, count)
+            except constants.Error as e:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                self.retried_pages.append(
+                    dict(
+                        record_type=record_type,
+                        page=page,
+                        count=count,
+                        attempt=attempt,
+                        error=e,
+                    )
+                )
+                if self.metrics is not None:
+                    self.metrics.retry(record_type)
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                self.resync()
+
+    def GenericRecordYielder(
+        self, header, data, record_type, crc_mode=None, reverse=False
+    ):
+        """Yield the records of a page, last first if reverse.
+
+        crc_mode (default self.crc_mode) is one of constants.CRC_MODES: strict
+        checks every record as it is built, deferred on first field access,
+        and page checks the whole page up front in a single pass.
+        """
+        if crc_mode is None:
+            crc_mode = self.crc_mode
+        count = header[1]
+        if crc_mode == constants.CRC_PAGE:
+            mask = record_type.VerifyPage(data, count)
+            if not all(mask):
+                raise constants.CrcError(
+                    "Could not parse %s at record %d"
+                    % (record_type.__name__, mask.index(False))
+                )
+        schema = database_records.Schema(record_type)
+        size = record_type._ClassSize()
+        if schema.size != size:
+            # Records padded past their FORMAT (calibrations) unpack singly.
+            for x in reversed(range(count)) if reverse else range(count):
+                yield record_type.Create(data, x, crc_mode)
+            return
+        # One copy of the page, shared by its records, instead of a slice
+        # per record; the copy also frees the records from data's buffer.
+        page = bytes(memoryview(data)[: count * size])
+        if reverse:
+            for x in reversed(range(count)):
+                values = schema.struct.unpack_from(page, x * size)
+                yield record_type(values, page, crc_mode, x)
+            return
+        for x, values in enumerate(schema.struct.iter_unpack(page)):
+            yield record_type(values, page, crc_mode, x)
 
     PARSER_MAP = {
         "USER_EVENT_DATA": database_records.EventRecord,
@@ -280,10 +647,11 @@ class Dexcom:
         "SENSOR_DATA": database_records.SensorRecord,
     }
 
-    def ParsePage(self, header, data):
-        record_type = constants.RECORD_TYPES[ord(header[2])]
+    def RecordClass(self, header):
+        """The database_records class for a page's records, or None."""
+        record_type = constants.RECORD_TYPES[header[2]]
         revision = int(header[3])
-        generic_parser_map = self.PARSER_MAP
+        generic_parser_map = dict(self.PARSER_MAP)
         if revision > 4 and record_type == "EGV_DATA":
             generic_parser_map.update(EGV_DATA=database_records.G6EGVRecord)
         if revision > 1 and record_type == "INSERTION_TIME":
@@ -292,40 +660,183 @@ class Dexcom:
             generic_parser_map.update(METER_DATA=database_records.G5MeterRecord)
         if revision < 2 and record_type == "CAL_SET":
             generic_parser_map.update(CAL_SET=database_records.LegacyCalibration)
+        return generic_parser_map.get(record_type)
+
+    def ParsePage(self, header, data, reverse=False):
+        """The records of a page, last first if reverse."""
+        record_type = constants.RECORD_TYPES[header[2]]
+        record_class = self.RecordClass(header)
         xml_parsed = ["PC_SOFTWARE_PARAMETER", "MANUFACTURING_DATA"]
-        if record_type in generic_parser_map:
-            return self.GenericRecordYielder(
-                header, data, generic_parser_map[record_type]
+        if record_class is not None:
+            records = self.GenericRecordYielder(
+                header, data, record_class, reverse=reverse
             )
         elif record_type in xml_parsed:
-            return [database_records.GenericXMLRecord.Create(data, 0)]
+            records = [database_records.GenericXMLRecord.Create(data, 0)]
         else:
             raise NotImplementedError(
                 "Parsing of %s has not yet been implemented" % record_type
             )
+        if self.metrics is not None:
+            return instrumentation.CountRecords(self.metrics, record_type, records)
+        return records
 
-    def iter_records(self, record_type):
-        assert record_type in constants.RECORD_TYPES
-        page_range = self.ReadDatabasePageRange(record_type)
-        start, end = page_range
-        if start != end or not end:
-            end += 1
-        for x in reversed(range(start, end)):
-            records = list(self.ReadDatabasePage(record_type, x))
-            records.reverse()
-            yield from records
+    # Pages the pipelined reader may fetch ahead of the parser.
+    PIPELINE_DEPTH = 8
 
-    def ReadRecords(self, record_type):
+    def _iter_pages(self, record_type, pages, reverse=False):
+        if self.pipelined:
+            return pipeline.PagePipeline(
+                self, record_type, pages, reverse, self.PIPELINE_DEPTH
+            )
+        return self.iter_raw_pages(record_type, pages, reverse)
+
+    def _iter_newest_pages(self, record_type, pages):
+        """Yield pages newest first, reading the newest one on its own.
+
+        For readers that may stop early: no pages are fetched ahead, and
+        the first request is for a single page.
+        """
+        if self.page_cache is not None:
+            yield from self.iter_raw_pages(record_type, pages, reverse=True)
+            return
+        stop, step = pages.stop, 1
+        while stop > pages.start:
+            first = max(pages.start, stop - step)
+            yield from self.iter_raw_pages(record_type, range(first, stop), True)
+            stop, step = first, self.PAGES_PER_REQUEST
+
+    def iter_records(self, record_type, reverse=True, since=None, limit=None):
+        """Yield records one page at a time, newest first unless not reverse.
+
+        since (a datetime) drops records with an earlier system_time, and at
+        most limit records are yielded. Pages are read only until both are
+        met: newest first, the newest page is read alone and each page is
+        decoded back to front, so the last few records cost one request;
+        oldest first, the pages from since on are found as in
+        iter_records_between.
+        """
+        if since is not None and not reverse:
+            records = self.iter_records_between(record_type, since)
+        else:
+            pages = self.PageNumbers(record_type)
+            if reverse and (since is not None or limit is not None):
+                raw_pages = self._iter_newest_pages(record_type, pages)
+            else:
+                raw_pages = self._iter_pages(record_type, pages, reverse=reverse)
+            records = (
+                record
+                for header, data in raw_pages
+                for record in self.ParsePage(header, data, reverse=reverse)
+            )
+        yield from TakeRecords(records, since, limit, reverse)
+
+    def ReadRecords(self, record_type, batch=False):
+        """Every record of record_type, oldest first.
+
+        With batch, a recordbatch.RecordBatch of row views is returned in
+        place of a list of record objects; its pages are CRC checked whole.
+        """
+        pages = self.PageNumbers(record_type)
+        if batch:
+            started = time.perf_counter()
+            records = recordbatch.FromPages(
+                self, record_type, self._iter_pages(record_type, pages)
+            )
+            if self.metrics is not None:
+                self.metrics.records_parsed(
+                    record_type, len(records), time.perf_counter() - started
+                )
+            return records
         records = []
-        assert record_type in constants.RECORD_TYPES
-        page_range = self.ReadDatabasePageRange(record_type)
-        start, end = page_range
-        if start != end or not end:
-            end += 1
-        for x in range(start, end):
-            records.extend(self.ReadDatabasePage(record_type, x))
+        for header, data in self._iter_pages(record_type, pages):
+            records.extend(self.ParsePage(header, data))
         return records
 
+    def _PageStartTime(self, record_type, page, probes):
+        """system_time of the first record on page, or None if it is empty.
+
+        The page read is kept in probes as (system_time, (header, data)).
+        """
+        if page not in probes:
+            pages = range(page, page + 1)
+            raw = next(iter(self.iter_raw_pages(record_type, pages)))
+            first = next(iter(self.ParsePage(*raw)), None)
+            probes[page] = (None if first is None else first.system_time, raw)
+        return probes[page][0]
+
+    def _iter_probed_pages(self, record_type, pages, probes):
+        """Yield (header, data) for the range pages, reusing probed pages.
+
+        The pages between probed ones are read in runs, unless that takes
+        more requests than reading them all at once, probed ones included.
+        """
+        runs = []
+        for page in pages:
+            if page in probes:
+                continue
+            if runs and runs[-1][1] == page:
+                runs[-1][1] += 1
+            else:
+                runs.append([page, page + 1])
+        step = max(1, self.PAGES_PER_REQUEST)
+        if runs:
+            whole = -(-(runs[-1][1] - runs[0][0]) // step)
+            if sum(-(-(stop - first) // step) for first, stop in runs) > whole:
+                runs = [[runs[0][0], runs[-1][1]]]
+        page = pages.start
+        for first, stop in runs:
+            for probed in range(page, first):
+                yield probes[probed][1]
+            yield from self._iter_pages(record_type, range(first, stop))
+            page = stop
+        for probed in range(page, pages.stop):
+            yield probes[probed][1]
+
+    def _LastPageStartingBy(self, record_type, pages, when, probes):
+        """Binary search pages for the last one whose first record is <= when."""
+        lo, hi = pages.start, pages.stop
+        while lo < hi:
+            mid = (lo + hi) // 2
+            started = self._PageStartTime(record_type, mid, probes)
+            if started is not None and started <= when:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(pages.start, lo - 1)
+
+    def iter_records_between(self, record_type, start=None, end=None):
+        """Yield the records with start <= system_time <= end, oldest first.
+
+        start and end are datetimes; None leaves that side open. The pages
+        holding the window are found by binary search, probing one page per
+        step, so only O(log pages) pages outside the window are read; probed
+        pages inside it are not read again. Records are assumed to be stored
+        in system_time order.
+        """
+        pages = self.PageNumbers(record_type)
+        if not pages:
+            return
+        probes = {}
+        first = pages.start
+        if start is not None:
+            first = self._LastPageStartingBy(record_type, pages, start, probes)
+        last = pages.stop - 1
+        if end is not None:
+            later = range(first, pages.stop)
+            last = self._LastPageStartingBy(record_type, later, end, probes)
+        window = range(first, last + 1)
+        for header, data in self._iter_probed_pages(record_type, window, probes):
+            for record in self.ParsePage(header, data):
+                when = record.system_time
+                if end is not None and when > end:
+                    return
+                if start is None or when >= start:
+                    yield record
+
+    def ReadRecordsBetween(self, record_type, start=None, end=None):
+        return list(self.iter_records_between(record_type, start, end))
+
 
 class DexcomG5(Dexcom):
     PARSER_MAP = {
@@ -349,12 +860,33 @@ class DexcomG6(Dexcom):
     }
 
 
-def GetDevice(port, G5=False, G6=False):
+def TakeRecords(records, since=None, limit=None, reverse=True):
+    """Yield from records, stopping once limit of them have been yielded.
+
+    Records with a system_time before since are dropped. When records run
+    newest first (reverse), the first such record ends the iteration, as
+    every record after it is older still.
+    """
+    if limit is not None and limit <= 0:
+        return
+    count = 0
+    for record in records:
+        if since is not None and record.system_time < since:
+            if reverse:
+                return
+            continue
+        yield record
+        count += 1
+        if count == limit:
+            return
+
+
+def GetDevice(port, G5=False, G6=False, **kwargs):
     if G5:
-        return DexcomG5(port)
+        return DexcomG5(port, **kwargs)
     if G6:
-        return DexcomG6(port)
-    return Dexcom(port)
+        return DexcomG6(port, **kwargs)
+    return Dexcom(port, **kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+"""Hold many fixed-size records in one buffer instead of one object each.
+
+    batch = dex.ReadRecords("EGV_DATA", batch=True)
+    batch[-1].glucose, batch[-1].display_time
+    batch.Column("system_seconds")
+
+A RecordBatch keeps each struct field of its records as a typed
+array.array column, one contiguous buffer per field. Indexing or iterating
+builds a row view on demand: an instance of a subclass of the record class
+whose data is read from the columns and whose raw_data is packed back from
+them, so every property of EGVRecord, SensorRecord, MeterRecord, ... (and
+check_crc and dump) works unchanged. A record costs about its size on the
+receiver, against a few hundred bytes for a record object with its tuple,
+bytes and field objects.
+"""
+
+import array
+import struct
+import sys
+
+from . import constants, database_records
+
+_views = {}
+
+
+def _ArrayCode(code):
+    """The array typecode holding struct code (little-endian), or None."""
+    if code == "c":
+        code = "B"
+    if code not in "bBhHiIlLqQ":
+        return None
+    width = struct.calcsize("<" + code)
+    for typecode in "bhilq" if code.islower() else "BHILQ":
+        if array.array(typecode).itemsize == width:
+            return typecode
+    return None
+
+
+def _ViewClass(record_class):
+    """The row view subclass of record_class, created on first use."""
+    view_class = _views.get(record_class)
+    if view_class is None:
+
+        def __init__(self, batch, row):
+            self._batch = batch
+            self._row = row
+
+        view_class = _views[record_class] = type(
+            record_class.__name__ + "View",
+            (record_class,),
+            dict(
+                __slots__=("_batch", "_row"),
+                __init__=__init__,
+                # Rows have no buffer of their own; see calculate_crc.
+                _index=None,
+                __doc__="A row of a RecordBatch of %s." % record_class.__name__,
+                data=property(lambda self: self._batch.Row(self._row)),
+                raw_data=property(lambda self: self._batch.RawRow(self._row)),
+            ),
+        )
+    return view_class
+
+
+class RecordBatch:
+    """The records of one fixed-size record class, stored column-wise.
+
+    Pages are added with AddPage. Only integer and single byte fields are
+    stored, so packing a row gives back its raw bytes exactly; records
+    padded past their FORMAT (calibrations, with their subrecords), with
+    floats, or XML have no batch layout and raise constants.Error.
+    """
+
+    def __init__(self, record_class):
+        schema = database_records.Schema(record_class)
+        typecodes = [_ArrayCode(code) for code in schema.codes]
+        if schema.size != record_class._ClassSize() or None in typecodes:
+            raise constants.Error("No batch layout for %s" % record_class.__name__)
+        self.record_class = record_class
+        self._schema = schema
+        self._view_class = _ViewClass(record_class)
+        self._length = 0
+        self._columns = [array.array(typecode) for typecode in typecodes]
+        self._chars = [code == "c" for code in schema.codes]
+
+    def AddPage(self, header, data, verify=True):
+        """Append the header[1] records of a page payload.
+
+        With verify, every record's CRC is checked first and a CrcError
+        raised on any mismatch, leaving the batch unchanged.
+        """
+        count = header[1]
+        size = self._schema.size
+        if verify:
+            mask = self.record_class.VerifyPage(data, count)
+            if not all(mask):
+                raise constants.CrcError(
+                    "Could not parse %s at record %d"
+                    % (self.record_class.__name__, mask.index(False))
+                )
+        raw = bytes(memoryview(data)[: count * size])
+        for column, offset in zip(self._columns, self._schema.offsets):
+            # Gather the field's bytes from every record with one strided
+            # copy per byte, without unpacking a tuple per record.
+            width = column.itemsize
+            field = bytearray(count * width)
+            for byte in range(width):
+                field[byte::width] = raw[offset + byte :: size]
+            values = array.array(column.typecode, field)
+            if sys.byteorder == "big":
+                values.byteswap()
+            column.extend(values)
+        self._length += count
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._view_class(self, i) for i in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("RecordBatch index out of range")
+        return self._view_class(self, index)
+
+    def __iter__(self):
+        view_class = self._view_class
+        for i in range(len(self)):
+            yield view_class(self, i)
+
+    def __reversed__(self):
+        view_class = self._view_class
+        for i in reversed(range(len(self))):
+            yield view_class(self, i)
+
+    def __repr__(self):
+        return "<RecordBatch of %d %s>" % (len(self), self.record_class.__name__)
+
+    def Row(self, index):
+        """The data tuple of record index, as struct.unpack would give it."""
+        return tuple(
+            bytes((column[index],)) if char else column[index]
+            for column, char in zip(self._columns, self._chars)
+        )
+
+    def RawRow(self, index):
+        """The raw bytes of record index, packed back from its data."""
+        return self._schema.struct.pack(*self.Row(index))
+
+    def Column(self, name):
+        """The array.array of struct field name, one value per record."""
+        return self._columns[self._schema.index[name]]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns."""
+        return sum(column.itemsize * len(column) for column in self._columns)
+
+
+def FromPages(dex, record_type, pages, verify=True):
+    """Build a RecordBatch from the (header, data) pairs of record_type.
+
+    dex picks the record class of each page; all pages must share one.
+    """
+    batch = None
+    for header, data in pages:
+        record_class = dex.RecordClass(header)
+        if record_class is None:
+            raise constants.Error("No batch layout for %s" % record_type)
+        if batch is None:
+            batch = RecordBatch(record_class)
+        elif record_class is not batch.record_class:
+            raise constants.Error(
+                "Page %d of %s uses %s, not %s"
+                % (
+                    header[4],
+                    record_type,
+                    record_class.__name__,
+                    batch.record_class.__name__,
+                )
+            )
+        batch.AddPage(header, data, verify)
+    if batch is None:
+        record_class = dex.PARSER_MAP.get(record_type)
+        if record_class is None:
+            raise constants.Error("No batch layout for %s" % record_type)
+        batch = RecordBatch(record_class)
+    return batch
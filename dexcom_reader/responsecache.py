@@ -0,0 +1,101 @@
+import threading
+import time
+
+from . import constants
+
+# Cached until the session ends (or a matching write invalidates it).
+IMMUTABLE = float("inf")
+
+# Settings a user can change on the receiver itself (pairing a transmitter,
+# moving the clock for DST, ...), which no WRITE_* through this library
+# invalidates, so a long-lived session must read them again now and then.
+SETTING_TTL = 30
+
+# How long each kind of response may be reused, in seconds. Keys are command
+# IDs, or record type names for responses built from database pages. Anything
+# not listed here is never cached.
+DEFAULT_TTLS = {
+    constants.READ_FIRMWARE_HEADER: IMMUTABLE,
+    constants.READ_FIRMWARE_SETTINGS: IMMUTABLE,
+    constants.READ_DATABASE_PARTITION_INFO: IMMUTABLE,
+    constants.READ_HARDWARE_BOARD_ID: IMMUTABLE,
+    "MANUFACTURING_DATA": IMMUTABLE,
+    constants.READ_TRANSMITTER_ID: SETTING_TTL,
+    constants.READ_LANGUAGE: SETTING_TTL,
+    constants.READ_DISPLAY_TIME_OFFSET: SETTING_TTL,
+    constants.READ_SYSTEM_TIME_OFFSET: SETTING_TTL,
+    constants.READ_GLUCOSE_UNIT: SETTING_TTL,
+    constants.READ_CLOCK_MODE: SETTING_TTL,
+    constants.READ_BLINDED_MODE: SETTING_TTL,
+    constants.READ_CHARGER_CURRENT_SETTING: SETTING_TTL,
+    constants.READ_BATTERY_LEVEL: 30,
+    constants.READ_BATTERY_STATE: 30,
+    constants.READ_DATABASE_PAGE_RANGE: 5,
+}
+
+# Commands that change receiver state, and the cached responses they make
+# stale.
+INVALIDATED_BY = {
+    constants.WRITE_TRANSMITTER_ID: [constants.READ_TRANSMITTER_ID],
+    constants.WRITE_LANGUAGE: [constants.READ_LANGUAGE],
+    constants.WRITE_DISPLAY_TIME_OFFSET: [constants.READ_DISPLAY_TIME_OFFSET],
+    constants.WRITE_SYSTEM_TIME: [
+        constants.READ_SYSTEM_TIME_OFFSET,
+        constants.READ_DISPLAY_TIME_OFFSET,
+    ],
+    constants.WRITE_GLUCOSE_UNIT: [constants.READ_GLUCOSE_UNIT],
+    constants.WRITE_BLINDED_MODE: [constants.READ_BLINDED_MODE],
+    constants.WRITE_CLOCK_MODE: [constants.READ_CLOCK_MODE],
+    constants.WRITE_CHARGER_CURRENT_SETTING: [constants.READ_CHARGER_CURRENT_SETTING],
+    constants.ERASE_DATABASE: [constants.READ_DATABASE_PAGE_RANGE],
+}
+
+
+class ResponseCache:
+    """Per-session memo of receiver responses with per-command lifetimes.
+
+    Entries are looked up by an arbitrary key and carry the rule (command ID
+    or record type) that decides their TTL and what invalidates them.
+    """
+
+    def __init__(self, ttls=None, invalidated_by=None, clock=time.monotonic):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.invalidated_by = dict(
+            INVALIDATED_BY if invalidated_by is None else invalidated_by
+        )
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def Lookup(self, key, rule, compute):
+        """Return the cached value for key, or compute() and cache it."""
+        ttl = self.ttls.get(rule)
+        if not ttl:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            value = compute()
+            self._entries[key] = (value, self._clock() + ttl, rule)
+            return value
+
+    def Invalidate(self, command_id):
+        """Forget every response made stale by sending command_id."""
+        stale = self.invalidated_by.get(command_id)
+        if stale is None:
+            if command_id == constants.RESET_RECEIVER:
+                self.Clear()
+            return
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[2] in stale:
+                    del self._entries[key]
+
+    def Clear(self):
+        with self._lock:
+            self._entries.clear()
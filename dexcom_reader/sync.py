@@ -0,0 +1,131 @@
+"""Incremental record download with persistent high-water marks.
+
+    state = sync.SyncState("~/.dexcom-sync.json")
+    new = sync.SyncRecords(dex, "EGV_DATA", state)
+    store(new)
+    state.Save()
+
+For each receiver serial number and record type the state remembers the last
+page read, how many records it held, and the system time of the newest record
+delivered. The next sync starts at that page (the newest page is usually only
+partly filled), skips the records already delivered from it, and reads only
+the pages written since. Save the state only once the records are stored, so
+a crash in between re-delivers them rather than losing them.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from . import constants, planner
+
+
+class SyncState:
+    """High-water marks per (serial number, record type), kept in a JSON file.
+
+    With no path the marks live only as long as the object. The marks may be
+    read, changed and saved from several threads.
+    """
+
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path) if path else None
+        self._marks = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                self._marks = json.load(f)
+
+    def Get(self, serial_number, record_type):
+        """The mark dict (page, records, system_time), or None."""
+        with self._lock:
+            mark = self._marks.get(serial_number, {}).get(record_type)
+            return dict(mark) if mark is not None else None
+
+    def Set(self, serial_number, record_type, page, records, system_time):
+        with self._lock:
+            self._marks.setdefault(serial_number, {})[record_type] = dict(
+                page=page, records=records, system_time=system_time
+            )
+
+    def Forget(self, serial_number, record_type=None):
+        """Drop marks so the next sync downloads everything again."""
+        with self._lock:
+            if record_type is None:
+                self._marks.pop(serial_number, None)
+            else:
+                self._marks.get(serial_number, {}).pop(record_type, None)
+
+    def Save(self):
+        """Atomically write the marks back to path."""
+        if not self.path:
+            return
+        # One save at a time, so an older snapshot never replaces a newer one.
+        with self._save_lock:
+            with self._lock:
+                snapshot = json.dumps(self._marks, indent=1, sort_keys=True)
+            fd, tmp = tempfile.mkstemp(
+                dir=os.path.dirname(self.path) or ".",
+                prefix=os.path.basename(self.path) + ".",
+                suffix=".tmp",
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(snapshot)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+
+def SyncRecords(dex, record_type, state, serial_number=None):
+    """Return the records of record_type not delivered by earlier syncs.
+
+    Records come oldest first, and state is advanced past them in memory;
+    call state.Save() to make that permanent. serial_number defaults to the
+    receiver's own; any other string keys a separate set of marks, as the
+    daemon does per consumer. Which pages to read is decided by
+    planner.PlanSync, so a poll that finds no new records downloads no pages
+    at all.
+    """
+    records, advance = ReadNew(dex, record_type, state, serial_number)
+    advance()
+    return records
+
+
+def ReadNew(dex, record_type, state, serial_number=None):
+    """SyncRecords without advancing state: return (records, advance).
+
+    Calling advance() moves state past records, in memory like SyncRecords.
+    Until then the same records are returned again, so a caller handing them
+    on (the daemon, over its socket) advances only once they were delivered.
+    """
+    assert record_type in constants.RECORD_TYPES
+    if serial_number is None:
+        serial_number = dex.ReadSerialNumber()
+    mark = state.Get(serial_number, record_type)
+    plan = planner.PlanSync(dex, record_type, mark)
+    records = []
+    page = records_on_page = None
+    for header, data in dex._iter_pages(record_type, plan.pages):
+        page, records_on_page = header[4], header[1]
+        parsed = dex.ParsePage(header, data)
+        if page == plan.pages.start and plan.skip:
+            parsed = list(parsed)[plan.skip :]
+        if plan.newer_than is not None:
+            parsed = [r for r in parsed if r.data[0] > plan.newer_than]
+        records.extend(parsed)
+    if page is None:
+        return records, lambda: None
+    if records:
+        system_time = records[-1].data[0]
+    elif mark is not None:
+        system_time = mark["system_time"]
+    else:
+        system_time = None
+
+    def advance():
+        state.Set(serial_number, record_type, page, records_on_page, system_time)
+
+    return records, advance
@@ -1,9 +1,11 @@
+import binascii
 import datetime
 import os
 import platform
 import plistlib
 import re
 import subprocess
+from xml.etree import ElementTree as ET
 
 from . import constants
 
@@ -12,8 +14,27 @@ def ReceiverTimeToTime(rtime):
     return constants.BASE_TIME + datetime.timedelta(seconds=rtime)
 
 
-def linux_find_usbserial(vendor, product):
+def JsonDefault(value):
+    """json.dumps default= hook for receiver values: times, XML, bytes, records."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, ET.Element):
+        return dict(value.attrib)
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return value.decode("ascii")
+        except UnicodeDecodeError:
+            return binascii.hexlify(value).decode("ascii")
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError("Cannot serialise %r" % type(value))
+
+
+def linux_find_all_usbserial(vendor, product):
     DEV_REGEX = re.compile("^tty(USB|ACM)[0-9]+$")
+    found = []
     for usb_dev_root in os.listdir("/sys/bus/usb/devices"):
         device_name = os.path.join("/sys/bus/usb/devices", usb_dev_root)
         if not os.path.exists(os.path.join(device_name, "idVendor")):
@@ -27,10 +48,21 @@ def linux_find_usbserial(vendor, product):
         for root, dirs, files in os.walk(device_name):
             for option in dirs + files:
                 if DEV_REGEX.match(option):
-                    return os.path.join("/dev", option)
+                    tty = os.path.join("/dev", option)
+                    if tty not in found:
+                        found.append(tty)
+    return found
+
+
+def linux_find_usbserial(vendor, product):
+    found = linux_find_all_usbserial(vendor, product)
+    if found:
+        return found[0]
 
 
-def osx_find_usbserial(vendor, product):  # noqa: C901
+def osx_find_all_usbserial(vendor, product):  # noqa: C901
+    found = []
+
     def recur(v):
         if hasattr(v, "__iter__") and "idVendor" in v and "idProduct" in v:
             if v["idVendor"] == vendor and v["idProduct"] == product:
@@ -39,20 +71,17 @@ def osx_find_usbserial(vendor, product):  # noqa: C901
                     if "IODialinDevice" not in tmp and "IORegistryEntryChildren" in tmp:
                         tmp = tmp["IORegistryEntryChildren"]
                     elif "IODialinDevice" in tmp:
-                        return tmp["IODialinDevice"]
+                        found.append(tmp["IODialinDevice"])
+                        return
                     else:
                         break
 
         if isinstance(v, list):
             for x in v:
-                out = recur(x)
-                if out is not None:
-                    return out
+                recur(x)
         elif isinstance(v, dict) or issubclass(type(v), dict):
             for x in list(v.values()):
-                out = recur(x)
-                if out is not None:
-                    return out
+                recur(x)
 
     sp = subprocess.Popen(
         ["/usr/sbin/ioreg", "-k", "IODialinDevice", "-r", "-t", "-l", "-a", "-x"],
@@ -62,7 +91,14 @@ def osx_find_usbserial(vendor, product):  # noqa: C901
     )
     stdout, _ = sp.communicate()
     plist = plistlib.readPlistFromString(stdout)
-    return recur(plist)
+    recur(plist)
+    return found
+
+
+def osx_find_usbserial(vendor, product):
+    found = osx_find_all_usbserial(vendor, product)
+    if found:
+        return found[0]
 
 
 def find_usbserial(vendor, product):
@@ -82,3 +118,14 @@ def find_usbserial(vendor, product):
         return osx_find_usbserial(vendor, product)
     else:
         raise NotImplementedError("Cannot find serial ports on %s" % platform.system())
+
+
+def find_all_usbserial(vendor, product):
+    """Like find_usbserial, but return every matching tty device as a list."""
+    if platform.system() == "Linux":
+        vendor, product = [("%04x" % (x)).strip() for x in (vendor, product)]
+        return linux_find_all_usbserial(vendor, product)
+    elif platform.system() == "Darwin":
+        return osx_find_all_usbserial(vendor, product)
+    else:
+        raise NotImplementedError("Cannot find serial ports on %s" % platform.system())
@@ -19,13 +19,15 @@ setup(
     maintainer_email="bewest+dexcom_reader@gmail.com",
     url="https://github.com/openaps/dexcom_reader",
     packages=find_packages(),
+    python_requires=">=3.7",
     install_requires=["pyserial"],
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
         "Intended Audience :: Science/Research",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
+        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3 :: Only",
         "Topic :: Scientific/Engineering",
         "Topic :: Software Development :: Libraries",
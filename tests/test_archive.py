@@ -0,0 +1,36 @@
+import pytest
+
+from dexcom_reader import archive, constants, emulator, readdata
+
+
+@pytest.fixture
+def dex():
+    with emulator.ReceiverEmulator(emulator.SyntheticDatabase("G4", pages=4)) as rx:
+        dex = readdata.Dexcom(rx.port, timeout=5)
+        yield dex
+        dex.Disconnect()
+
+
+def test_capture_round_trip(dex, tmp_path):
+    path = str(tmp_path / "receiver.dxa")
+    archive.Capture(dex, path, ["EGV_DATA", "SENSOR_DATA"])
+    with archive.Archive(path) as arc:
+        for record_type in ("EGV_DATA", "SENSOR_DATA"):
+            expected = [r.to_dict() for r in dex.ReadRecords(record_type)]
+            got = [r.to_dict() for r in arc.ReadRecords(record_type)]
+            assert got == expected
+
+
+def test_failed_capture_leaves_no_archive(dex, tmp_path, monkeypatch):
+    path = tmp_path / "receiver.dxa"
+    iter_pages = dex._iter_pages
+
+    def failing(record_type, pages, reverse=False):
+        if record_type == "EGV_DATA":
+            raise constants.Error("Timed out reading packet")
+        return iter_pages(record_type, pages, reverse)
+
+    monkeypatch.setattr(dex, "_iter_pages", failing)
+    with pytest.raises(constants.Error):
+        archive.Capture(dex, str(path))
+    assert list(tmp_path.iterdir()) == []
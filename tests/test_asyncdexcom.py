@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+if sys.version_info < (3, 7):
+    pytest.skip("asyncdexcom needs Python 3.7", allow_module_level=True)
+
+from dexcom_reader import asyncdexcom, constants, emulator  # noqa: E402
+
+
+@pytest.fixture
+def rx():
+    with emulator.ReceiverEmulator(emulator.SyntheticDatabase("G4", pages=2)) as rx:
+        yield rx
+
+
+def _open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_late_reply_is_not_taken_for_the_next(rx):
+    async def run():
+        async with asyncdexcom.AsyncDexcom(rx.port, timeout=0.1) as dex:
+            rx.command_delay = 0.3
+            with pytest.raises(asyncio.TimeoutError):
+                await dex.ReadBatteryLevel()
+            rx.command_delay = 0
+            return await dex.ReadRTC(), await dex.ReadBatteryLevel()
+
+    rtc, level = asyncio.run(run())
+    assert rtc.year == 2018
+    assert level == 83
+
+
+def test_recovers_from_crc_errors(rx):
+    async def run():
+        async with asyncdexcom.AsyncDexcom(rx.port, timeout=2) as dex:
+            rx.error_rate = 0.3
+            for _ in range(20):
+                try:
+                    await dex.ReadBatteryLevel()
+                except constants.Error:
+                    pass
+            rx.error_rate = 0
+            return await dex.ReadBatteryLevel()
+
+    assert asyncio.run(run()) == 83
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs procfs")
+def test_connect_cycles_release_fds(rx):
+    async def run():
+        dex = asyncdexcom.AsyncDexcom(rx.port, timeout=2)
+        assert all(await asyncio.gather(*[dex.Ping() for _ in range(5)]))
+        await dex.Disconnect()
+
+    asyncio.run(run())
+    before = _open_fds()
+    for _ in range(3):
+        asyncio.run(run())
+    assert _open_fds() == before
+
+
+def test_client_made_outside_the_loop(rx):
+    dex = asyncdexcom.AsyncDexcom(rx.port, timeout=2)
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                *[dex.ReadBatteryLevel() for _ in range(5)], dex.ReadRTC()
+            )
+        finally:
+            await dex.Disconnect()
+
+    *levels, rtc = asyncio.run(run())
+    assert levels == [83] * 5
+    assert rtc.year == 2018
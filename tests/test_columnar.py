@@ -0,0 +1,83 @@
+import pytest
+
+from dexcom_reader import columnar, constants, database_records, emulator, readdata
+
+numpy = pytest.importorskip("numpy")
+
+GENERATIONS = {
+    "G4": readdata.Dexcom,
+    "G5": readdata.DexcomG5,
+    "G6": readdata.DexcomG6,
+}
+RECORD_TYPES = (
+    "EGV_DATA",
+    "SENSOR_DATA",
+    "METER_DATA",
+    "USER_EVENT_DATA",
+    "INSERTION_TIME",
+)
+# Derived columns that are also properties of the record objects.
+PROPERTIES = (
+    "system_time",
+    "display_time",
+    "glucose",
+    "display_only",
+    "is_special",
+    "meter_time",
+    "event_value",
+    "insertion_time",
+)
+
+
+def _value(value):
+    if isinstance(value, numpy.datetime64):
+        return value.astype("datetime64[us]").item()
+    return value.item() if hasattr(value, "item") else value
+
+
+@pytest.mark.parametrize("generation", sorted(GENERATIONS))
+@pytest.mark.parametrize("record_type", RECORD_TYPES)
+def test_columns_match_record_objects(generation, record_type):
+    db = emulator.SyntheticDatabase(generation, pages=3)
+    with emulator.ReceiverEmulator(db) as rx:
+        dex = GENERATIONS[generation](rx.port, timeout=5)
+        records = dex.ReadRecords(record_type)
+        columns = columnar.ReadColumns(dex, record_type)
+        dex.Disconnect()
+    record_class = type(records[0])
+    schema = database_records.Schema(record_class)
+    for name, column in columns.items():
+        assert len(column) == len(records)
+        if name in schema.index and name not in PROPERTIES:
+            position = schema.index[name]
+            for record, value in zip(records, column):
+                expected = record.data[position]
+                if isinstance(expected, bytes):
+                    expected = expected[0]
+                assert _value(value) == expected
+    for name in PROPERTIES:
+        if name in columns:
+            values = [_value(v) for v in columns[name]]
+            assert values == [getattr(r, name) for r in records]
+    if "trend" in columns:
+        arrows = [constants.TREND_ARROW_VALUES[t] for t in columns["trend"]]
+        assert arrows == [r.trend_arrow for r in records]
+
+
+def test_decode_page_checks_crcs():
+    db = emulator.SyntheticDatabase("G4", pages=2)
+    index = constants.RECORD_TYPES.index("EGV_DATA")
+    header, data = readdata.Dexcom.SplitPages(db.page("EGV_DATA", 0), index, 0, 1)[0]
+    record_class = readdata.Dexcom(None).RecordClass(header)
+    assert len(columnar.DecodePage(record_class, header, data)) == header[1]
+    bad = bytearray(data)
+    bad[3] ^= 0xFF
+    with pytest.raises(constants.CrcError):
+        columnar.DecodePage(record_class, header, bytes(bad))
+    unchecked = columnar.DecodePage(record_class, header, bytes(bad), verify=False)
+    assert len(unchecked) == header[1]
+
+
+def test_calibrations_have_no_columnar_layout():
+    with pytest.raises(constants.Error):
+        columnar.DType(database_records.Calibration)
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from dexcom_reader import daemon, emulator, readdata, sync
+
+
+@pytest.fixture
+def receiver():
+    db = emulator.SyntheticDatabase("G4", pages=3)
+    with emulator.ReceiverEmulator(db) as rx:
+        yield db, rx
+
+
+@pytest.fixture
+def socket_path(receiver, tmp_path):
+    db, rx = receiver
+    dex = readdata.Dexcom(rx.port, timeout=5)
+    path = str(tmp_path / "dexcom.sock")
+    server = daemon.ReceiverDaemon(
+        path, daemon.ReceiverService(dex, state=sync.SyncState())
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    dex.Disconnect()
+
+
+def test_call(socket_path):
+    with daemon.DaemonClient(socket_path, timeout=10) as client:
+        assert client.Call("ReadBatteryLevel") == 83
+        records = client.Call("ReadRecords", record_type="EGV_DATA")
+    assert len(records) > 0
+    assert {"system_time", "display_time", "glucose"} <= set(records[0])
+
+
+def test_unknown_method(socket_path):
+    with daemon.DaemonClient(socket_path, timeout=10) as client:
+        with pytest.raises(daemon.constants.Error):
+            client.Call("WriteChargerCurrentSetting", status="Off")
+
+
+def test_sync_records_per_consumer(receiver, socket_path):
+    db, rx = receiver
+    total = db.record_count("EGV_DATA")
+    with daemon.DaemonClient(socket_path, timeout=10) as client:
+        assert len(client.SyncRecords("EGV_DATA", "uploader")) == total
+        assert client.SyncRecords("EGV_DATA", "uploader") == []
+        db.append("EGV_DATA", 3)
+        new = client.SyncRecords("EGV_DATA", "uploader")
+        assert len(new) == 3
+        # Another consumer still gets every record, including the new ones.
+        dashboard = client.SyncRecords("EGV_DATA", "dashboard")
+        assert len(dashboard) == total + 3
+        assert dashboard[-3:] == new
+
+
+def test_sync_marks_advance_only_once_delivered(receiver):
+    db, rx = receiver
+    dex = readdata.Dexcom(rx.port, timeout=5)
+    try:
+        service = daemon.ReceiverService(dex, state=sync.SyncState())
+        params = {"record_type": "EGV_DATA", "consumer": "uploader"}
+        first, delivered = service.Call("SyncRecords", params)
+        # The answer never reached the client: the same records come again.
+        again, delivered = service.Call("SyncRecords", params)
+        assert [r.to_dict() for r in again] == [r.to_dict() for r in first]
+        delivered()
+        assert service.Call("SyncRecords", params)[0] == []
+    finally:
+        dex.Disconnect()
+
+
+def test_concurrent_consumers_save_every_mark(receiver, tmp_path):
+    db, rx = receiver
+    dex = readdata.Dexcom(rx.port, timeout=5)
+    path = str(tmp_path / "state.json")
+    service = daemon.ReceiverService(dex, state=sync.SyncState(path))
+    consumers = ["consumer%d" % i for i in range(20)]
+    errors = []
+
+    def sync_all(names):
+        try:
+            for name in names:
+                records, delivered = service.SyncRecords("EGV_DATA", name)
+                delivered()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=sync_all, args=(consumers[i::4],)) for i in range(4)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        serial_number = dex.ReadSerialNumber()
+    finally:
+        dex.Disconnect()
+    assert errors == []
+    saved = sync.SyncState(path)
+    for name in consumers:
+        assert saved.Get("%s/%s" % (serial_number, name), "EGV_DATA") is not None
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
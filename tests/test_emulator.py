@@ -0,0 +1,90 @@
+import pytest
+
+from dexcom_reader import emulator, readdata, responsecache
+
+GENERATIONS = {
+    "G4": readdata.Dexcom,
+    "G5": readdata.DexcomG5,
+    "G6": readdata.DexcomG6,
+}
+RECORD_TYPES = (
+    "EGV_DATA",
+    "SENSOR_DATA",
+    "METER_DATA",
+    "USER_EVENT_DATA",
+    "INSERTION_TIME",
+    "CAL_SET",
+)
+
+
+@pytest.mark.parametrize("generation", sorted(GENERATIONS))
+def test_read_records_round_trip(generation):
+    db = emulator.SyntheticDatabase(generation, pages=4)
+    with emulator.ReceiverEmulator(db) as rx:
+        dex = GENERATIONS[generation](rx.port, timeout=5)
+        assert dex.Ping()
+        assert dex.ReadManufacturingData().get("SerialNumber") == db.serial_number
+        for record_type in RECORD_TYPES:
+            records = dex.ReadRecords(record_type)
+            assert len(records) == db.record_count(record_type)
+            times = [r.data[0] for r in records]
+            expected = [db.system_time(record_type, i) for i in range(len(records))]
+            if record_type != "CAL_SET":
+                assert times == expected
+            newest_first = list(dex.iter_records(record_type))
+            assert [r.raw_data for r in newest_first] == [
+                r.raw_data for r in reversed(records)
+            ]
+        dex.Disconnect()
+
+
+@pytest.mark.parametrize("generation", sorted(GENERATIONS))
+def test_retries_ride_out_corrupt_and_truncated_responses(generation):
+    db = emulator.SyntheticDatabase(generation, pages=8)
+    with emulator.ReceiverEmulator(db) as rx:
+        dex = GENERATIONS[generation](rx.port, timeout=5)
+        expected = [r.raw_data for r in dex.ReadRecords("EGV_DATA")]
+        dex.Disconnect()
+    with emulator.ReceiverEmulator(
+        db, error_rate=0.15, truncate_rate=0.15, seed=7
+    ) as rx:
+        dex = GENERATIONS[generation](
+            rx.port,
+            timeout=0.3,
+            retries=8,
+            retry_backoff=0.001,
+            cache=responsecache.ResponseCache(
+                {readdata.constants.READ_DATABASE_PAGE_RANGE: responsecache.IMMUTABLE}
+            ),
+        )
+        # Page reads are retried, the page range read is not: read it until
+        # it succeeds, then ReadRecords and iter_records reuse it.
+        while True:
+            try:
+                dex.PageNumbers("EGV_DATA")
+                break
+            except readdata.constants.Error:
+                dex.resync()
+        assert [r.raw_data for r in dex.ReadRecords("EGV_DATA")] == expected
+        newest_first = dex.iter_records("EGV_DATA")
+        assert [r.raw_data for r in newest_first] == expected[::-1]
+        assert rx.errors_injected > 0
+        assert dex.retried_pages
+        dex.Disconnect()
+
+
+def test_retry_log_is_bounded():
+    class Dexcom(readdata.Dexcom):
+        RETRY_HISTORY = 2
+
+    db = emulator.SyntheticDatabase("G4", pages=4)
+    with emulator.ReceiverEmulator(db, error_rate=0.5, seed=3) as rx:
+        dex = Dexcom(rx.port, timeout=0.3, retries=20, retry_backoff=0.001)
+        for _ in range(5):
+            try:
+                dex.ReadRecords("EGV_DATA")
+            except readdata.constants.Error:
+                dex.resync()
+        assert len(dex.retried_pages) == Dexcom.RETRY_HISTORY
+        assert rx.errors_injected > Dexcom.RETRY_HISTORY
+        dex.Disconnect()
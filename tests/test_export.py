@@ -0,0 +1,27 @@
+import gzip
+import json
+
+from dexcom_reader import emulator, export, readdata
+
+
+def test_main_exports_with_a_serial_timeout(tmp_path, monkeypatch):
+    opened = []
+    get_device = readdata.GetDevice
+
+    def GetDevice(port, **kwargs):
+        opened.append(kwargs)
+        return get_device(port, **kwargs)
+
+    monkeypatch.setattr(export.readdata, "GetDevice", GetDevice)
+    db = emulator.SyntheticDatabase("G4", pages=3)
+    path = str(tmp_path / "out.ndjson.gz")
+    with emulator.ReceiverEmulator(db) as rx:
+        export.main(["--port", rx.port, "-o", path, "EGV_DATA", "METER_DATA"])
+    assert opened[0]["pipelined"]
+    assert opened[0]["timeout"] == 5
+    with gzip.open(path, "rt") as f:
+        rows = [json.loads(line) for line in f]
+    for record_type in ("EGV_DATA", "METER_DATA"):
+        times = [r["system_time"] for r in rows if r["record_type"] == record_type]
+        assert len(times) == db.record_count(record_type)
+        assert times == sorted(times)
@@ -0,0 +1,74 @@
+import contextlib
+
+from dexcom_reader import emulator, fleet
+
+
+def _receivers(count):
+    stack = contextlib.ExitStack()
+    receivers = []
+    for i in range(count):
+        db = emulator.SyntheticDatabase("G4", pages=2, serial_number="SM%08d" % i)
+        receivers.append(stack.enter_context(emulator.ReceiverEmulator(db)))
+    return stack, receivers
+
+
+def test_download_fleet():
+    stack, receivers = _receivers(3)
+    with stack:
+        results = fleet.DownloadFleet(
+            ["EGV_DATA"], [rx.port for rx in receivers], max_workers=2, deadline=30
+        )
+    assert sorted(results) == ["SM00000000", "SM00000001", "SM00000002"]
+    for result in results.values():
+        assert result.ok
+        assert len(result.records["EGV_DATA"]) > 0
+
+
+def test_failing_progress_callback_does_not_stop_the_queue():
+    def progress(result, event, detail):
+        if event == "started":
+            raise RuntimeError("progress callback failed")
+
+    stack, receivers = _receivers(3)
+    with stack:
+        results = fleet.DownloadFleet(
+            ["EGV_DATA"],
+            [rx.port for rx in receivers],
+            max_workers=1,
+            deadline=30,
+            progress=progress,
+        )
+    assert len(results) == 3
+    for result in results.values():
+        assert result.finished is not None
+        assert isinstance(result.error, RuntimeError)
+
+
+def test_serial_timeout_reaches_the_device():
+    seen = []
+
+    class Device:
+        def __init__(self, port, **kwargs):
+            seen.append(kwargs)
+            raise OSError("could not open %s" % port)
+
+    results = fleet.DownloadFleet(["EGV_DATA"], ["/dev/a"], device_class=Device)
+    fleet.DownloadFleet(["EGV_DATA"], ["/dev/b"], device_class=Device, timeout=1)
+    assert seen == [{"timeout": fleet.SERIAL_TIMEOUT}, {"timeout": 1}]
+    # The constructor's own error is reported, not a fleet timeout.
+    result = results["/dev/a"]
+    assert isinstance(result.error, OSError)
+    assert result.finished is not None
+
+
+def test_deadline_reports_unfinished_receivers():
+    stack, receivers = _receivers(2)
+    with stack:
+        for rx in receivers:
+            rx.command_delay = 2
+        results = fleet.DownloadFleet(
+            ["EGV_DATA"], [rx.port for rx in receivers], max_workers=1, deadline=0.5
+        )
+        assert len(results) == 2
+        for result in results.values():
+            assert isinstance(result.error, TimeoutError)
@@ -0,0 +1,83 @@
+import io
+import struct
+
+import pytest
+
+from dexcom_reader import constants, emulator, framereader, readdata
+
+
+class _Port:
+    """Serves data in chunks of at most chunk bytes, like a slow tty."""
+
+    def __init__(self, data, chunk=None):
+        self._buf = io.BytesIO(data)
+        self._chunk = chunk
+
+    @property
+    def in_waiting(self):
+        return len(self._buf.getbuffer()) - self._buf.tell()
+
+    def readinto(self, b):
+        if self._chunk is not None:
+            b = memoryview(b)[: self._chunk]
+        return self._buf.readinto(b)
+
+
+def _frame(value):
+    return emulator.Frame(constants.ACK, struct.pack("<I", value))
+
+
+def test_leftover_bytes_serve_the_next_frame():
+    reader = framereader.FrameReader(_Port(_frame(1) + _frame(2)))
+    assert reader.read_frame() == (constants.ACK, struct.pack("<I", 1))
+    assert reader.reads == 1
+    assert len(reader) == len(_frame(2))
+    assert reader.read_frame() == (constants.ACK, struct.pack("<I", 2))
+    assert reader.reads == 1
+    assert len(reader) == 0
+
+
+def test_frames_split_across_reads():
+    reader = framereader.FrameReader(_Port(_frame(1) + _frame(2), chunk=3))
+    assert reader.read_frame()[1] == struct.pack("<I", 1)
+    assert reader.read_frame()[1] == struct.pack("<I", 2)
+    with pytest.raises(constants.Error):
+        reader.read_frame()
+
+
+def test_bad_crc_consumes_only_that_frame():
+    bad = bytearray(_frame(1))
+    bad[-1] ^= 0xFF
+    reader = framereader.FrameReader(_Port(bytes(bad) + _frame(2)))
+    with pytest.raises(constants.CrcError):
+        reader.read_frame()
+    assert reader.read_frame()[1] == struct.pack("<I", 2)
+
+
+def test_resync_skips_to_the_next_frame():
+    port = _Port(b"\x00\x17garbage" + _frame(1) + _frame(2), chunk=4)
+    reader = framereader.FrameReader(port)
+    with pytest.raises(constants.Error):
+        reader.read_frame()
+    reader.resync()
+    assert reader.read_frame()[1] == struct.pack("<I", 1)
+    assert reader.read_frame()[1] == struct.pack("<I", 2)
+
+
+def test_buffer_wraps_for_long_runs_of_frames():
+    frames = [_frame(i) for i in range(100)]
+    reader = framereader.FrameReader(_Port(b"".join(frames)), capacity=64)
+    for i in range(100):
+        assert reader.read_frame()[1] == struct.pack("<I", i)
+
+
+def test_buffered_dexcom_matches_unbuffered():
+    db = emulator.SyntheticDatabase("G4", pages=3)
+    with emulator.ReceiverEmulator(db) as rx:
+        expected = [
+            r.raw_data for r in readdata.Dexcom(rx.port).ReadRecords("EGV_DATA")
+        ]
+        dex = readdata.Dexcom(rx.port, buffered=True, timeout=5)
+        assert dex.ReadBatteryLevel() == 83
+        assert [r.raw_data for r in dex.ReadRecords("EGV_DATA")] == expected
+        dex.Disconnect()
@@ -0,0 +1,35 @@
+from dexcom_reader import constants, emulator, instrumentation, readdata
+
+
+def test_command_names_are_commands():
+    for command_id, name in instrumentation.COMMAND_NAMES.items():
+        assert getattr(constants, name) == command_id
+        assert not name.endswith("_MASK")
+    assert instrumentation.CommandName(constants.READ_DATABASE_PARTITION_INFO) == (
+        "READ_DATABASE_PARTITION_INFO"
+    )
+    assert instrumentation.CommandName(constants.MAX_COMMAND) == str(
+        constants.MAX_COMMAND
+    )
+
+
+def test_prometheus_command_labels():
+    metrics = instrumentation.Metrics()
+    with emulator.ReceiverEmulator(emulator.SyntheticDatabase("G4", pages=2)) as rx:
+        dex = readdata.Dexcom(rx.port, timeout=5, metrics=metrics)
+        try:
+            dex.DataPartitions()
+            dex.ReadBatteryLevel()
+            dex.ReadRecords("EGV_DATA")
+        finally:
+            dex.Disconnect()
+    text = metrics.prometheus()
+    for name in (
+        "READ_DATABASE_PARTITION_INFO",
+        "READ_BATTERY_LEVEL",
+        "READ_DATABASE_PAGE_RANGE",
+        "READ_DATABASE_PAGES",
+    ):
+        assert 'dexcom_commands_total{command="%s"}' % name in text
+    assert "MASK" not in text
+    assert metrics.snapshot()["record_types"]["EGV_DATA"]["records"] > 0
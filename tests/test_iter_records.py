@@ -0,0 +1,89 @@
+import asyncio
+import sys
+
+import pytest
+
+from dexcom_reader import constants, emulator, readdata
+
+PAGES = constants.READ_DATABASE_PAGES
+
+
+@pytest.fixture
+def rx():
+    with emulator.ReceiverEmulator(emulator.SyntheticDatabase("G4", pages=10)) as rx:
+        yield rx
+
+
+@pytest.fixture
+def dex(rx):
+    dex = readdata.Dexcom(rx.port, timeout=5)
+    yield dex
+    dex.Disconnect()
+
+
+def _raw(records):
+    return [r.raw_data for r in records]
+
+
+def test_limit_reads_only_the_newest_page(rx, dex):
+    records = dex.ReadRecords("EGV_DATA")
+    dex.PageNumbers("EGV_DATA")
+    before = rx.commands[PAGES]
+    newest = list(dex.iter_records("EGV_DATA", limit=3))
+    assert _raw(newest) == _raw(records[::-1][:3])
+    assert rx.commands[PAGES] - before == 1
+    assert list(dex.iter_records("EGV_DATA", limit=0)) == []
+
+
+def test_since_stops_at_older_records(rx, dex):
+    records = dex.ReadRecords("EGV_DATA")
+    since = records[-60].system_time
+    before = rx.commands[PAGES]
+    newer = list(dex.iter_records("EGV_DATA", since=since))
+    assert _raw(newer) == _raw(records[-60:][::-1])
+    # The newest page alone, then one batch of PAGES_PER_REQUEST older pages
+    # reaching past since; the other pages are never read.
+    assert rx.commands[PAGES] - before == 2
+    both = list(dex.iter_records("EGV_DATA", since=since, limit=10))
+    assert _raw(both) == _raw(records[-10:][::-1])
+
+
+def test_oldest_first_with_since(dex):
+    records = dex.ReadRecords("EGV_DATA")
+    since = records[-60].system_time
+    oldest_first = dex.iter_records("EGV_DATA", reverse=False, since=since, limit=5)
+    assert _raw(oldest_first) == _raw(records[-60:-55])
+    assert _raw(dex.iter_records("EGV_DATA", reverse=False)) == _raw(records)
+
+
+def test_take_records():
+    class Record:
+        def __init__(self, system_time):
+            self.system_time = system_time
+
+    times = [5, 4, 3, 2, 1]
+    newest_first = [Record(t) for t in times]
+    taken = readdata.TakeRecords(newest_first, since=3)
+    assert [r.system_time for r in taken] == [5, 4, 3]
+    taken = readdata.TakeRecords(newest_first[::-1], since=3, reverse=False)
+    assert [r.system_time for r in taken] == [3, 4, 5]
+    taken = readdata.TakeRecords(newest_first, limit=2)
+    assert [r.system_time for r in taken] == [5, 4]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="asyncdexcom needs 3.7")
+def test_async_iter_records(rx, dex):
+    from dexcom_reader import asyncdexcom
+
+    records = dex.ReadRecords("EGV_DATA")
+    since = records[-45].system_time
+
+    async def run():
+        async with asyncdexcom.AsyncDexcom(rx.port, timeout=5) as client:
+            limited = [r async for r in client.iter_records("EGV_DATA", limit=4)]
+            newer = [r async for r in client.iter_records("EGV_DATA", since=since)]
+            return limited, newer
+
+    limited, newer = asyncio.run(run())
+    assert _raw(limited) == _raw(records[::-1][:4])
+    assert _raw(newer) == _raw(records[-45:][::-1])
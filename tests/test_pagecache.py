@@ -0,0 +1,73 @@
+import pytest
+
+from dexcom_reader import emulator, pagecache, readdata
+
+
+@pytest.fixture
+def rx():
+    with emulator.ReceiverEmulator(emulator.SyntheticDatabase("G4", pages=30)) as rx:
+        yield rx
+
+
+def _commands(rx):
+    return sum(rx.commands.values())
+
+
+def test_cached_pages_match_the_receiver(rx, tmp_path):
+    expected = [r.to_dict() for r in readdata.Dexcom(rx.port).ReadRecords("EGV_DATA")]
+    cache = pagecache.PageCache(str(tmp_path))
+    dex = readdata.Dexcom(rx.port, page_cache=cache)
+    assert [r.to_dict() for r in dex.ReadRecords("EGV_DATA")] == expected
+    before = rx.commands.get(readdata.constants.READ_DATABASE_PAGES, 0)
+    assert [r.to_dict() for r in dex.ReadRecords("EGV_DATA")] == expected
+    # Only the newest, partly filled page is downloaded again.
+    assert rx.commands[readdata.constants.READ_DATABASE_PAGES] == before + 1
+    offline = pagecache.OfflineReceiver(cache, dex.ReadSerialNumber())
+    cached = [r.to_dict() for r in offline.ReadRecords("EGV_DATA")]
+    # Everything but the newest page, which is never cached.
+    assert cached == expected[: len(cached)]
+    assert 0 < len(expected) - len(cached) < rx.database.records_per_page("EGV_DATA")
+
+
+def test_window_queries_cost_no_more_with_a_cache(rx, tmp_path):
+    records = readdata.Dexcom(rx.port).ReadRecords("EGV_DATA")
+    start, end = records[400].system_time, records[500].system_time
+    plain = readdata.Dexcom(rx.port)
+    before = _commands(rx)
+    plain.ReadRecordsBetween("EGV_DATA", start, end)
+    uncached = _commands(rx) - before
+
+    dex = readdata.Dexcom(rx.port, page_cache=pagecache.PageCache(str(tmp_path)))
+    dex.ReadSerialNumber()
+    before = _commands(rx)
+    dex.ReadRecordsBetween("EGV_DATA", start, end)
+    # Plus the page range read that checks the cache against the receiver.
+    assert _commands(rx) - before <= uncached + 1
+    before = _commands(rx)
+    window = dex.ReadRecordsBetween("EGV_DATA", start, end)
+    assert _commands(rx) - before <= 1
+    assert [r.to_dict() for r in window] == [r.to_dict() for r in records[400:501]]
+
+
+def test_window_queries_reuse_probed_pages(rx):
+    records = readdata.Dexcom(rx.port).ReadRecords("EGV_DATA")
+    per_page = rx.database.records_per_page("EGV_DATA")
+    dex = readdata.Dexcom(rx.port)
+    requested = []
+    read_pages = dex.ReadDatabasePages
+
+    def ReadDatabasePages(record_type, page, count=1):
+        requested.extend(range(page, page + count))
+        return read_pages(record_type, page, count)
+
+    dex.ReadDatabasePages = ReadDatabasePages
+    for first, last in ((400, 500), (0, 30), (30, 900), (len(records) - 20, -1)):
+        del requested[:]
+        window = dex.ReadRecordsBetween(
+            "EGV_DATA", records[first].system_time, records[last].system_time
+        )
+        expected = records[first : last % len(records) + 1]
+        assert [r.to_dict() for r in window] == [r.to_dict() for r in expected]
+        # The pages at either end of the window were probed, and not read again.
+        assert requested.count(first // per_page) == 1
+        assert requested.count(last % len(records) // per_page) == 1
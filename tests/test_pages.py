@@ -0,0 +1,68 @@
+import pytest
+
+from dexcom_reader import constants, database_records, emulator, packetwriter, readdata
+
+EGV = constants.RECORD_TYPES.index("EGV_DATA")
+
+
+@pytest.fixture
+def db():
+    return emulator.SyntheticDatabase("G4", pages=6)
+
+
+def test_split_pages(db):
+    payload = b"".join(db.page("EGV_DATA", page) for page in range(2, 5))
+    pages = readdata.Dexcom.SplitPages(payload, EGV, 2, 3)
+    assert [header.page_number for header, data in pages] == [2, 3, 4]
+    for page, (header, data) in zip(range(2, 5), pages):
+        single = readdata.Dexcom.SplitPages(db.page("EGV_DATA", page), EGV, page, 1)
+        assert header == single[0][0]
+        assert bytes(data) == bytes(single[0][1])
+        page_size = len(data) + database_records.PAGE_HEADER.size
+        assert page_size == constants.DATABASE_PAGE_SIZE
+
+
+def test_split_pages_checks_every_header(db):
+    payload = bytearray(b"".join(db.page("EGV_DATA", page) for page in range(3)))
+    # Corrupt the second page's header.
+    payload[constants.DATABASE_PAGE_SIZE + 1] ^= 0xFF
+    with pytest.raises(constants.CrcError):
+        readdata.Dexcom.SplitPages(bytes(payload), EGV, 0, 3)
+
+
+def test_split_pages_rejects_the_wrong_pages(db):
+    payload = b"".join(db.page("EGV_DATA", page) for page in range(2))
+    with pytest.raises(constants.Error):
+        readdata.Dexcom.SplitPages(payload, EGV, 1, 2)
+    with pytest.raises(constants.Error):
+        readdata.Dexcom.SplitPages(payload[:-1], EGV, 0, 2)
+    with pytest.raises(constants.Error):
+        readdata.Dexcom.SplitPages(b"", EGV, 0, 1)
+
+
+def test_page_batches():
+    dex = readdata.Dexcom(None)
+    step = dex.PAGES_PER_REQUEST
+    payload = step * constants.DATABASE_PAGE_SIZE
+    assert 1 < step and payload <= packetwriter.PacketWriter.MAX_PAYLOAD
+    pages = range(1, 2 * step + 2)
+    forward = list(dex.PageBatches(pages))
+    assert forward == [(1, step), (1 + step, step), (1 + 2 * step, 1)]
+    backward = list(dex.PageBatches(pages, reverse=True))
+    assert backward == [(2 + step, step), (2, step), (1, 1)]
+
+
+def test_read_records_fetches_several_pages_per_command(db):
+    with emulator.ReceiverEmulator(db) as rx:
+        dex = readdata.Dexcom(rx.port, timeout=5)
+        pages = dex.PageNumbers("EGV_DATA")
+        before = rx.commands.get(constants.READ_DATABASE_PAGES, 0)
+        records = dex.ReadRecords("EGV_DATA")
+        requests = rx.commands[constants.READ_DATABASE_PAGES] - before
+        assert requests == -(-len(pages) // dex.PAGES_PER_REQUEST)
+        assert len(records) == db.record_count("EGV_DATA")
+        newest_first = list(dex.iter_records("EGV_DATA"))
+        assert [r.raw_data for r in newest_first] == [
+            r.raw_data for r in reversed(records)
+        ]
+        dex.Disconnect()
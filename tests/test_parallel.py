@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from dexcom_reader import constants, emulator, parallel, readdata, util
+
+
+def _raw_pages(generation, record_type, pages):
+    db = emulator.SyntheticDatabase(generation, pages=pages)
+    index = constants.RECORD_TYPES.index(record_type)
+    first, last = db.page_range(record_type)
+    return [
+        readdata.Dexcom.SplitPages(db.page(record_type, page), index, page, 1)[0]
+        for page in range(first, last + 1)
+    ]
+
+
+def _dicts(dex, raw):
+    return [
+        json.loads(json.dumps(record.to_dict(), default=util.JsonDefault))
+        for header, data in raw
+        for record in dex.ParsePage(header, data)
+    ]
+
+
+@pytest.mark.parametrize(
+    "device_class,generation,record_type",
+    [
+        (readdata.Dexcom, "G4", "EGV_DATA"),
+        (readdata.DexcomG5, "G5", "SENSOR_DATA"),
+        (readdata.DexcomG6, "G6", "EGV_DATA"),
+    ],
+)
+def test_parse_pages_keeps_page_order(device_class, generation, record_type):
+    raw = _raw_pages(generation, record_type, 12)
+    expected = _dicts(device_class(None), raw)
+    records = list(
+        parallel.ParsePages(iter(raw), device_class, max_workers=2, batch_pages=3)
+    )
+    assert records == expected
+
+
+def test_parse_pages_ndjson_blocks():
+    raw = _raw_pages("G4", "EGV_DATA", 7)
+    blocks = list(parallel.ParsePagesNDJSON(raw, max_workers=2, batch_pages=2))
+    assert len(blocks) == 4
+    lines = b"".join(blocks).splitlines()
+    assert [json.loads(line) for line in lines] == _dicts(readdata.Dexcom(None), raw)
+
+
+def test_worker_crc_errors_reach_the_caller():
+    raw = _raw_pages("G4", "EGV_DATA", 4)
+    header, data = raw[2]
+    bad = bytearray(data)
+    bad[5] ^= 0xFF
+    raw[2] = (header, bytes(bad))
+    with pytest.raises(constants.CrcError):
+        list(parallel.ParsePages(raw, max_workers=2, batch_pages=1))
+
+
+def test_no_pages():
+    assert list(parallel.ParsePages([], max_workers=1)) == []
@@ -0,0 +1,30 @@
+import time
+
+from dexcom_reader import emulator, pipeline, readdata
+
+
+def test_pipelined_read_matches_serial():
+    db = emulator.SyntheticDatabase("G5", pages=20)
+    with emulator.ReceiverEmulator(db) as rx:
+        expected = [
+            r.to_dict() for r in readdata.DexcomG5(rx.port).ReadRecords("EGV_DATA")
+        ]
+        dex = readdata.DexcomG5(rx.port, pipelined=True)
+        assert [r.to_dict() for r in dex.ReadRecords("EGV_DATA")] == expected
+
+
+def test_close_is_bounded_when_the_receiver_goes_silent(monkeypatch):
+    monkeypatch.setattr(pipeline.PagePipeline, "CLOSE_TIMEOUT", 0.2)
+    db = emulator.SyntheticDatabase("G4", pages=20)
+    with emulator.ReceiverEmulator(db) as rx:
+        dex = readdata.Dexcom(rx.port, timeout=None)
+        pages = dex.PageNumbers("EGV_DATA")
+        reader = pipeline.PagePipeline(dex, "EGV_DATA", pages)
+        it = iter(reader)
+        rx.command_delay = 1.0
+        next(it)
+        # The reader is now waiting on the next, slow, request.
+        started = time.monotonic()
+        it.close()
+        assert time.monotonic() - started < 0.9
+        assert not reader.close()
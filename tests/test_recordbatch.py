@@ -0,0 +1,83 @@
+import pytest
+
+from dexcom_reader import constants, database_records, emulator, readdata, recordbatch
+
+GENERATIONS = {
+    "G4": readdata.Dexcom,
+    "G5": readdata.DexcomG5,
+    "G6": readdata.DexcomG6,
+}
+RECORD_TYPES = (
+    "EGV_DATA",
+    "SENSOR_DATA",
+    "METER_DATA",
+    "USER_EVENT_DATA",
+    "INSERTION_TIME",
+)
+
+
+@pytest.mark.parametrize("generation", sorted(GENERATIONS))
+def test_batch_rows_match_record_objects(generation):
+    db = emulator.SyntheticDatabase(generation, pages=3)
+    with emulator.ReceiverEmulator(db) as rx:
+        dex = GENERATIONS[generation](rx.port, timeout=5)
+        for record_type in RECORD_TYPES:
+            records = dex.ReadRecords(record_type)
+            batch = dex.ReadRecords(record_type, batch=True)
+            assert isinstance(batch, recordbatch.RecordBatch)
+            assert len(batch) == len(records)
+            for row, record in zip(batch, records):
+                assert isinstance(row, type(record))
+                assert row.data == record.data
+                assert row.raw_data == record.raw_data
+                assert row.to_dict() == record.to_dict()
+                row.check_crc()
+        dex.Disconnect()
+
+
+def _batch(pages=3):
+    db = emulator.SyntheticDatabase("G4", pages=pages)
+    dex = readdata.Dexcom(None)
+    index = constants.RECORD_TYPES.index("EGV_DATA")
+    first, last = db.page_range("EGV_DATA")
+    raw = [
+        readdata.Dexcom.SplitPages(db.page("EGV_DATA", page), index, page, 1)[0]
+        for page in range(first, last + 1)
+    ]
+    records = [r for header, data in raw for r in dex.ParsePage(header, data)]
+    return recordbatch.FromPages(dex, "EGV_DATA", raw), records, raw
+
+
+def test_indexing_and_columns():
+    batch, records, raw = _batch()
+    assert batch[-1].raw_data == records[-1].raw_data
+    assert [r.raw_data for r in batch[2:8:3]] == [r.raw_data for r in records[2:8:3]]
+    assert [r.raw_data for r in reversed(batch)] == [
+        r.raw_data for r in reversed(records)
+    ]
+    with pytest.raises(IndexError):
+        batch[len(records)]
+    assert list(batch.Column("system_seconds")) == [r.data[0] for r in records]
+    assert list(batch.Column("full_glucose")) == [r.full_glucose for r in records]
+    assert batch.nbytes == len(records) * database_records.EGVRecord._ClassSize()
+
+
+def test_bad_page_leaves_the_batch_unchanged():
+    batch, records, raw = _batch()
+    header, data = raw[0]
+    bad = bytearray(data)
+    bad[1] ^= 0xFF
+    with pytest.raises(constants.CrcError):
+        batch.AddPage(header, bytes(bad))
+    assert len(batch) == len(records)
+    batch.AddPage(header, bytes(bad), verify=False)
+    assert len(batch) == len(records) + header[1]
+    with pytest.raises(constants.CrcError):
+        batch[len(records)].check_crc()
+
+
+def test_no_layout_for_calibrations():
+    with pytest.raises(constants.Error):
+        recordbatch.RecordBatch(database_records.Calibration)
+    empty = recordbatch.FromPages(readdata.Dexcom(None), "EGV_DATA", [])
+    assert len(empty) == 0 and list(empty) == []
@@ -0,0 +1,111 @@
+import pytest
+
+from dexcom_reader import constants, emulator, readdata
+
+GENERATIONS = {
+    "G4": readdata.Dexcom,
+    "G5": readdata.DexcomG5,
+    "G6": readdata.DexcomG6,
+}
+RECORD_TYPES = (
+    "EGV_DATA",
+    "SENSOR_DATA",
+    "METER_DATA",
+    "USER_EVENT_DATA",
+    "INSERTION_TIME",
+    "CAL_SET",
+)
+
+
+def _pages(generation, record_type, pages=2):
+    db = emulator.SyntheticDatabase(generation, pages=pages)
+    index = constants.RECORD_TYPES.index(record_type)
+    first, last = db.page_range(record_type)
+    return [
+        readdata.Dexcom.SplitPages(db.page(record_type, page), index, page, 1)[0]
+        for page in range(first, last + 1)
+    ]
+
+
+@pytest.mark.parametrize("generation", sorted(GENERATIONS))
+@pytest.mark.parametrize("record_type", RECORD_TYPES)
+def test_page_records_match_single_records(generation, record_type):
+    dex = GENERATIONS[generation](None)
+    for header, data in _pages(generation, record_type):
+        record_class = dex.RecordClass(header)
+        expected = [record_class.Create(data, x) for x in range(header[1])]
+        for reverse in (False, True):
+            records = list(dex.ParsePage(header, data, reverse=reverse))
+            if reverse:
+                records.reverse()
+            assert [r.raw_data for r in records] == [r.raw_data for r in expected]
+            assert [r.to_dict() for r in records] == [r.to_dict() for r in expected]
+            for record in records:
+                record.check_crc()
+
+
+def test_records_do_not_alias_the_page_buffer():
+    dex = readdata.Dexcom(None)
+    header, data = _pages("G4", "EGV_DATA")[0]
+    buf = bytearray(data)
+    records = list(dex.ParsePage(header, buf))
+    raw = [r.raw_data for r in records]
+    buf[:] = bytes(len(buf))
+    assert [r.raw_data for r in records] == raw
+    for record in records:
+        record.check_crc()
+
+
+def _corrupt(data, record_class, index):
+    buf = bytearray(data)
+    buf[index * record_class._ClassSize() + 8] ^= 0xFF
+    return bytes(buf)
+
+
+def test_verify_page_masks_bad_records():
+    dex = readdata.Dexcom(None)
+    header, data = _pages("G4", "SENSOR_DATA")[0]
+    record_class = dex.RecordClass(header)
+    count = header[1]
+    assert record_class.VerifyPage(data, count) == [True] * count
+    mask = record_class.VerifyPage(_corrupt(data, record_class, 2), count)
+    assert mask == [x != 2 for x in range(count)]
+
+
+def test_crc_modes_reject_a_bad_record():
+    dex = readdata.Dexcom(None)
+    header, data = _pages("G4", "EGV_DATA")[0]
+    record_class = dex.RecordClass(header)
+    bad = _corrupt(data, record_class, 2)
+    with pytest.raises(constants.CrcError):
+        list(dex.GenericRecordYielder(header, bad, record_class, constants.CRC_STRICT))
+    # Page mode checks the whole page before yielding anything.
+    records = dex.GenericRecordYielder(header, bad, record_class, constants.CRC_PAGE)
+    with pytest.raises(constants.CrcError):
+        next(records)
+    # Deferred mode builds every record and fails on the bad one's first use.
+    records = list(
+        dex.GenericRecordYielder(header, bad, record_class, constants.CRC_DEFERRED)
+    )
+    assert len(records) == header[1]
+    assert records[1].glucose == records[1].data[2] & constants.EGV_VALUE_MASK
+    with pytest.raises(constants.CrcError):
+        records[2].glucose
+    with pytest.raises(constants.CrcError):
+        records[2].data
+    assert records[3].system_time is not None
+
+
+@pytest.mark.parametrize("crc_mode", constants.CRC_MODES)
+def test_crc_modes_read_the_same_records(crc_mode):
+    db = emulator.SyntheticDatabase("G5", pages=3)
+    with emulator.ReceiverEmulator(db) as rx:
+        expected = readdata.DexcomG5(rx.port).ReadRecords("SENSOR_DATA")
+        dex = readdata.DexcomG5(rx.port, crc_mode=crc_mode)
+        records = dex.ReadRecords("SENSOR_DATA")
+    assert [r.to_dict() for r in records] == [r.to_dict() for r in expected]
+
+
+def test_unknown_crc_mode():
+    with pytest.raises(constants.Error):
+        readdata.Dexcom(None, crc_mode="sometimes")
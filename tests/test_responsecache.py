@@ -0,0 +1,49 @@
+from dexcom_reader import constants, responsecache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _lookup(cache, rule, values):
+    return cache.Lookup(rule, rule, lambda: values.pop(0))
+
+
+def test_user_settings_expire():
+    clock = _Clock()
+    cache = responsecache.ResponseCache(clock=clock)
+    for rule in (
+        constants.READ_TRANSMITTER_ID,
+        constants.READ_DISPLAY_TIME_OFFSET,
+        constants.READ_SYSTEM_TIME_OFFSET,
+        constants.READ_GLUCOSE_UNIT,
+        constants.READ_CLOCK_MODE,
+        constants.READ_BLINDED_MODE,
+        constants.READ_CHARGER_CURRENT_SETTING,
+    ):
+        values = ["old", "new"]
+        assert _lookup(cache, rule, values) == "old"
+        assert _lookup(cache, rule, values) == "old"
+    clock.now += responsecache.SETTING_TTL + 1
+    values = ["new"]
+    assert _lookup(cache, constants.READ_TRANSMITTER_ID, values) == "new"
+
+
+def test_firmware_header_and_manufacturing_data_are_kept():
+    clock = _Clock()
+    cache = responsecache.ResponseCache(clock=clock)
+    for rule in (constants.READ_FIRMWARE_HEADER, "MANUFACTURING_DATA"):
+        assert _lookup(cache, rule, ["first"]) == "first"
+        clock.now += 86400
+        assert _lookup(cache, rule, ["second"]) == "first"
+
+
+def test_write_invalidates():
+    cache = responsecache.ResponseCache(clock=_Clock())
+    assert _lookup(cache, constants.READ_GLUCOSE_UNIT, ["mg/dL"]) == "mg/dL"
+    cache.Invalidate(constants.WRITE_GLUCOSE_UNIT)
+    assert _lookup(cache, constants.READ_GLUCOSE_UNIT, ["mmol/L"]) == "mmol/L"
@@ -0,0 +1,62 @@
+import struct
+
+import pytest
+
+from dexcom_reader import constants, crc16, database_records, readdata
+
+RECORD_CLASSES = sorted(
+    {
+        cls
+        for device_class in (readdata.Dexcom, readdata.DexcomG5, readdata.DexcomG6)
+        for cls in device_class.PARSER_MAP.values()
+    }
+    | {
+        database_records.G6EGVRecord,
+        database_records.G5InsertionRecord,
+        database_records.G5MeterRecord,
+        database_records.LegacyCalibration,
+        database_records.SubCal,
+        database_records.GenericXMLRecord,
+    },
+    key=lambda cls: cls.__name__,
+)
+
+
+@pytest.mark.parametrize("record_class", RECORD_CLASSES, ids=lambda c: c.__name__)
+def test_schema_matches_format(record_class):
+    schema = database_records.Schema(record_class)
+    assert database_records.Schema(record_class) is schema
+    assert record_class._ClassFormat() is schema.struct
+    assert schema.struct.format == record_class.FORMAT
+    assert schema.size == struct.calcsize(record_class.FORMAT)
+    assert len(schema.names) == len(schema.codes) == len(schema.offsets)
+    assert len(schema.names) == len(schema.struct.unpack(bytes(schema.size)))
+    # Each field sits at its offset: packed alone, it gives back those bytes.
+    byte_order = record_class.FORMAT[0]
+    raw = bytes(i % 251 for i in range(schema.size))
+    values = schema.struct.unpack(raw)
+    for i, (code, offset) in enumerate(zip(schema.codes, schema.offsets)):
+        packed = struct.pack(byte_order + code, values[i])
+        assert raw[offset : offset + len(packed)] == packed
+    for position, name in record_class.STRUCT_FIELDS.items():
+        assert schema.names[position] == name
+        assert schema.index[name] == position
+    if record_class.FORMAT.endswith("H"):
+        assert schema.names[-1] == "crc"
+
+
+def test_named_fields_read_the_right_values():
+    record_class = database_records.EGVRecord
+    schema = database_records.Schema(record_class)
+    raw = schema.struct.pack(100, 200, 0x8000 | 123, b"\x03", 0)
+    crc = crc16.crc16(raw, 0, len(raw) - 2)
+    raw = schema.struct.pack(100, 200, 0x8000 | 123, b"\x03", crc)
+    values = schema.struct.unpack(raw)
+    for name, code, offset in zip(schema.names, schema.codes, schema.offsets):
+        (value,) = struct.unpack_from("<" + code, raw, offset)
+        assert value == values[schema.index[name]]
+    record = record_class(values, raw, crc_mode=constants.CRC_DEFERRED)
+    assert record.full_glucose == 0x8000 | 123
+    assert record.glucose == 123
+    assert record.display_only
+    assert record.trend_arrow == constants.TREND_ARROW_VALUES[3]